@@ -3,6 +3,12 @@ import numpy as np
 from neuron import h
 h.load_file('stdrun.hoc')
 
+import sys
+sys.path.append('..')  # shared synfire package lives in diesmann_1999/
+from synfire.model import add_chain
+from synfire.inputs import NoiseCurrent
+from synfire.simrun import run_figure
+
 def sine_wave(t, amplitude, frequency, phase=0):
     return amplitude * np.sin(2 * np.pi * frequency * t + phase)
 
@@ -22,13 +28,8 @@ secs['soma']['geom'] = {'diam': 15, 'L': 14, 'Ra': 120.0}
 secs['soma']['mechs']['hh'] = {'gnabar': 0.13, 'gkbar': 0.036, 'gl': 0.003, 'el': -70}  # soma hh mechanism
 netParams.cellParams['E'] = {'secs': secs}                                              # add dict to list of cell params
 
-## Population parameters
-for i in range(10):
-    if i == 0:
-        netParams.popParams[f'E{i}_in'] = {'cellType': 'E', 'numCells': 55, 'yRange': [i * 100, i * 100 + 1]}
-        netParams.popParams[f'E{i}'] = {'cellType': 'E', 'numCells': 45, 'yRange': [i * 100, i * 100 + 1]}
-    else:
-        netParams.popParams[f'E{i}'] = {'cellType': 'E', 'numCells': 100, 'yRange': [i * 100, i * 100 + 1]}
+## Populations and spacial connection: 10 layers of 100 cells, of which the first 55 of layer 0 project to layer 1
+add_chain(netParams, n_layers=10, layer_size=100, probability=0.1, weight=0.0007, delay=5, pop='E{}', n_input=55)
 
 ## Synaptic mechanism parameters
 netParams.synMechParams['exc'] = {'mod': 'Exp2Syn', 'tau1': 0.8, 'tau2': 5.3, 'e': 0}  # NMDA synaptic mechanism
@@ -37,23 +38,6 @@ netParams.synMechParams['exc'] = {'mod': 'Exp2Syn', 'tau1': 0.8, 'tau2': 5.3, 'e
 netParams.stimSourceParams['IStim'] = {'type': 'IClamp', 'del': 1, 'dur': 10, 'amp': 0.4}
 netParams.stimTargetParams['IStim->S'] = {'source': 'IStim', 'sec':'soma', 'loc': 0.5, 'conds': {'pop':'E0_in'}, 'synMech': 'exc'}
 
-# Spacial connection
-for i in range(10):
-    if i == 0:
-        netParams.connParams[f'E{i}_in->E{i+1}'] = {
-        'preConds': { 'pop' : f'E{i}_in' }, 'postConds': { 'pop' : f'E{i+1}' },  #  E -> all (100-1000 um)
-        'probability': 0.1 ,                  # probability of connection // CAN CHANGE
-        'weight': 0.0007,         # synaptic weight
-        'delay': 5,      # transmission delay (ms)
-        'synMech': 'exc'}
-    else:
-        netParams.connParams[f'E{i}->E{i+1}'] = {
-        'preConds': { 'pop' : f'E{i}' }, 'postConds': { 'pop' : f'E{i+1}' },  #  E -> all (100-1000 um)
-        'probability': 0.1 ,                  # probability of connection // CAN CHANGE
-        'weight': 0.0007,         # synaptic weight
-        'delay': 5,      # transmission delay (ms)
-        'synMech': 'exc'}
-
 # Simulation options
 simConfig = specs.SimConfig()        # object of class SimConfig to store simulation configuration
 
@@ -70,22 +54,13 @@ simConfig.analysis['plotTraces'] = {'include': [('E2',0), ('E4', 0), ('E5', 5)],
 simConfig.analysis['plot2Dnet'] = {'saveFig': True}                                                # plot 2D cell positions and connections
 simConfig.analysis['plotConn'] = {'saveFig': True}                                                 # plot connectivity matrix
 
-# Create network and run simulation
-sim.createSimulateAnalyze(netParams = netParams, simConfig = simConfig)
-
-# noise stimulation
-i_noise_list = []
-for cell in sim.net.cells:
-    i_noise = h.INoise(cell.secs['soma']['hObj'](0.5))
-    i_noise.delay = 0
-    i_noise.dur = simConfig.duration
-    i_noise.std = 0.4
-    i_noise.seed(cell.gid)
-    i_noise_list.append(i_noise)
-
-sim.runSim()                          # run parallel Neuron simulation
-sim.gatherData()                      # gather spiking data and cell info from each node
-sim.saveData()                        # save params, cell info and sim output to file (pickle,mat,txt,etc)
-sim.analysis.plotData()               # plot spike raster
+# noise stimulation, one random stream per cell
+def add_noise(cell):
+    return NoiseCurrent(cell.secs['soma']['hObj'](0.5), cell.gid, std=0.4, dur=simConfig.duration)
 
-sim.saveJSON('test.json', sim.allSimData)
\ No newline at end of file
+# Create network, attach the noise and run simulation once
+# (output also written as a columnar store, see synfire/store.py); threads,
+# MPI partition, trace streaming and connection cache are run_figure's
+# defaults (see synfire/simrun.py), e.g. n_threads=4 or
+# stream_traces={'dtype': 'float32'} to write the traces to disk during the run
+i_noise_list, = run_figure(netParams, simConfig, cell_hooks=[add_noise])
@@ -0,0 +1,56 @@
+import matplotlib.pyplot as plt
+import numpy as np
+
+import sys
+sys.path.append('..')  # shared synfire package lives in diesmann_1999/
+from synfire.kernel import estimate_kernel, model_params
+from synfire.cache import ResultCache
+from synfire.journal import SweepJournal
+
+# Transfer kernel of one fig3-c layer (100 cells, p = 0.1, w = 0.001 uS),
+# estimated from single-layer runs; plotting the (a, sigma) plane then needs
+# no chain simulation. Run as `python layer_kernel.py` (uses worker processes).
+a_values = np.arange(0, 101, 5)
+s_values = np.arange(0, 6.01, 0.5)
+n_trials = 100
+n_layers = 10
+root_seed = 1999
+experiment_params = {}
+
+# Layer batches are cached on disk, so only a changed grid is simulated
+cache = ResultCache('layer_kernel_cache.sqlite', model_params(experiment_params))
+journal = SweepJournal('layer_kernel_journal.jsonl', model_params(experiment_params))  # resume point if killed
+
+if __name__ == '__main__':
+    cache.print_invalidation_report()
+    kernel = estimate_kernel(a_values, s_values, n_trials=n_trials, root_seed=root_seed,
+                             experiment_params=experiment_params, cache=cache, journal=journal)
+
+    plt.figure(figsize=(8, 8))
+
+    # Separatrix: packets starting below it die out within n_layers layers
+    survival = kernel.survival(n_layers)
+    plt.contour(s_values, a_values, survival, levels=[0.5], colors='gray', linestyles=':', linewidths=2)
+
+    # Sampled trajectories from the fig3-c starting points
+    starts = [(30, 0, 'blue'), (47, 4.5, 'red'), (60, 4, 'green'), (20, 0, 'pink')]
+    for a_in, s_in, color in starts:
+        a_traj, s_traj = kernel.sample(a_in, s_in, n_layers, n_samples=5, seed=root_seed)
+        for k, (a, s) in enumerate(zip(a_traj, s_traj)):
+            plt.plot(s, a, '-o', markersize=3, color=color, alpha=0.5, label=f'a = {a_in}, σ = {s_in}' if k == 0 else None)
+
+    # Set labels and title
+    plt.xlabel('$sigma_{out}$ (ms)', fontsize=12)
+    plt.ylabel('$a_{out}$ (spikes)', fontsize=12)
+    plt.title('Spike Propagation (transfer kernel)', fontsize=14)
+
+    # Set axis limits
+    plt.xlim(0, s_values[-1])
+    plt.ylim(0, a_values[-1])
+
+    # Add grid and legend
+    plt.grid(True, linestyle='--', alpha=0.7)
+    plt.legend()
+
+    plt.tight_layout()
+    plt.savefig('layer_kernel.png', dpi=300, bbox_inches='tight')
@@ -0,0 +1,70 @@
+import resource
+import subprocess
+import time
+
+import numpy as np
+
+import sys
+sys.path.append('..')  # shared synfire package lives in diesmann_1999/
+from netpyne import specs, sim
+from synfire.model import soma_secs, EXC_SYN
+from synfire.connectivity import connect_cells, prob_conns
+
+# Build time of a 3-layer fig3 chain (two 'probability': 0.1 rules) against
+# layer width, connected by NetPyNE's connectCells and by connect_cells,
+# which makes the same connections. NetPyNE keeps a dict entry per pre/post
+# pair, so it only runs up to netpyne_max. Every build runs in its own
+# process; 'draw' is prob_conns alone for one layer pair.
+# Run as `python bench_connectivity.py [width ...]`.
+netpyne_max = 1000
+n_layers = 3
+probability = 0.1
+
+def build(width, method):
+    netParams = specs.NetParams()
+    netParams.cellParams['E'] = {'secs': soma_secs()}
+    for i in range(n_layers):
+        netParams.popParams[f'Neuron_{i}'] = {'cellType': 'E', 'numCells': width, 'yRange': [i * 100, i * 100 + 1]}
+    netParams.synMechParams['exc'] = dict(EXC_SYN)
+    for i in range(n_layers - 1):
+        netParams.connParams[f'Neuron_{i}->Neuron_{i + 1}'] = {
+            'preConds': {'pop': f'Neuron_{i}'}, 'postConds': {'pop': f'Neuron_{i + 1}'},
+            'probability': probability, 'weight': 0.001, 'delay': 15, 'synMech': 'exc'}
+    simConfig = specs.SimConfig()
+    simConfig.verbose = False
+
+    start = time.perf_counter()
+    sim.initialize(netParams, simConfig)
+    sim.net.createPops()
+    sim.net.createCells()
+    cells = time.perf_counter()
+    if method == 'netpyne':
+        sim.net.connectCells()
+    else:
+        connect_cells()
+    conns = sum(len(cell.conns) for cell in sim.net.cells)
+    print(conns, cells - start, time.perf_counter() - cells, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss // 1024)
+
+if sys.argv[1:2] == ['--build']:
+    build(int(sys.argv[2]), sys.argv[3])
+    sys.exit()
+
+def run(width, method):
+    out = subprocess.run([sys.executable, __file__, '--build', str(width), method], capture_output=True, text=True, check=True)
+    conns, t_cells, t_conns, rss = out.stdout.split()[-4:]
+    return int(conns), float(t_cells), float(t_conns), int(rss)
+
+widths = [int(arg) for arg in sys.argv[1:]] or [100, 300, 1000, 3000]
+print(f'{"width":>6} {"conns":>9} {"cells (s)":>9} {"draw (s)":>8} {"netpyne (s)":>11} {"MB":>6} {"vectorized (s)":>14} {"MB":>6}')
+for width in widths:
+    start = time.perf_counter()
+    prob_conns(np.arange(width), np.arange(width, 2 * width), probability, seed=1)
+    draw = time.perf_counter() - start
+    conns, t_cells, t_fast, rss_fast = run(width, 'vectorized')
+    if width <= netpyne_max:
+        netpyne_conns, _, t_netpyne, rss_netpyne = run(width, 'netpyne')
+        assert netpyne_conns == conns, f'width {width}: {netpyne_conns} != {conns} connections'
+        netpyne = f'{t_netpyne:>11.2f} {rss_netpyne:>6}'
+    else:
+        netpyne = f'{"-":>11} {"-":>6}'
+    print(f'{width:>6} {conns:>9} {t_cells:>9.2f} {draw:>8.2f} {netpyne} {t_fast:>14.2f} {rss_fast:>6}')
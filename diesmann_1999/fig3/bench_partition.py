@@ -0,0 +1,79 @@
+import subprocess
+import time
+
+import numpy as np
+
+import sys
+sys.path.append('..')  # shared synfire package lives in diesmann_1999/
+from synfire.partition import PARTITIONS, cell_cost, exchange_report, pop_layout
+
+# Round-robin against layer partitioning (synfire/partition.py) of the
+# fig3-c chain on 2 to 16 ranks. The chain is built and run once on one
+# rank, and each partition of its cells is scored: compute balance (the
+# busiest rank's cell_cost over the mean), connections that cross ranks, and
+# spikes other ranks need (total and busiest rank). The spikes do not depend
+# on the partition, as every random stream is keyed by gid.
+# Ranks given on the command line are also timed under mpiexec, where the
+# spikes must match the one-rank run. Exchange is the slowest rank's time
+# in the spike exchange.
+# Run as `python bench_partition.py [n_ranks ...]`.
+width, depth = 100, 10
+stimulus = (60, 4, 27)  # (a_in, s_in, seed)
+rank_counts = [2, 4, 8, 16]
+
+def build(partition):
+    from netpyne import sim
+    from synfire.chain import SynfireChain
+
+    chain = SynfireChain(n_layers=depth, layer_size=width, probability=0.1, weight=0.001, delay=15, stim_amp=0.4,
+                         stim_dur=1, input_target='cell', t_mean=20, noise_std=0.3, duration=20 + 17.5 * depth + 20,
+                         dt=0.1, partition=partition)
+    exchange = sim.pc.wait_time()
+    start = time.perf_counter()
+    spkt, spkid = chain.run(*stimulus)
+    run_time = time.perf_counter() - start
+    exchange = sim.pc.allreduce(sim.pc.wait_time() - exchange, 2)
+    return sim, spkt, spkid, run_time, exchange
+
+if sys.argv[1:2] == ['--build']:
+    from neuron import h
+    h.nrnmpi_init()                       # before NetPyNE creates its ParallelContext
+    sim, spkt, spkid, run_time, exchange = build(sys.argv[2])
+    if sim.rank == 0:
+        print(len(spkt), hash((tuple(spkt), tuple(spkid))), run_time, exchange)
+    sim.pc.barrier()
+    sim.pc.done()
+    h.quit()                              # finalizes MPI
+
+def run(partition, n_ranks):
+    command = [sys.executable, __file__, '--build', partition]
+    if n_ranks > 1:
+        command = ['mpiexec', '-n', str(n_ranks)] + command
+    out = subprocess.run(command, capture_output=True, text=True, check=True)
+    spikes, spike_hash, t_run, t_exchange = out.stdout.split()[-4:]
+    return int(spikes), int(spike_hash), float(t_run), float(t_exchange)
+
+sim, spkt, spkid, _, _ = build(None)
+sizes, in_degrees = pop_layout(sim.net.params)
+cost = cell_cost(sizes, in_degrees)
+pre = np.array([conn['preGid'] for cell in sim.net.cells for conn in cell.conns])
+post = np.array([cell.gid for cell in sim.net.cells for conn in cell.conns])
+print(f'{width} x {depth} chain, {len(pre)} connections, {len(spkid)} spikes')
+print(f'{"ranks":>5} {"partition":>11} {"balance":>7} {"conns out":>9} {"spikes out":>10} {"max/rank":>8}')
+for n_ranks in rank_counts:
+    for name, partition in PARTITIONS.items():
+        report = exchange_report(partition(sizes, in_degrees, n_ranks), pre, post, spkid, cost)
+        balance = report['cost'].max() / report['cost'].mean()
+        print(f'{n_ranks:>5} {name:>11} {balance:>7.3f} {report["conns_out"].sum():>9} '
+              f'{report["spikes_out"].sum():>10} {report["spikes_out"].max():>8}')
+
+timed = [int(arg) for arg in sys.argv[1:]]
+if timed:
+    spikes, reference, t_run, _ = run('round_robin', 1)
+    print(f'\n{"ranks":>5} {"partition":>11} {"run (s)":>8} {"exchange (s)":>12}')
+    print(f'{1:>5} {"-":>11} {t_run:>8.2f} {0:>12.3f}')
+    for n_ranks in timed:
+        for name in PARTITIONS:
+            spikes, spike_hash, t_run, t_exchange = run(name, n_ranks)
+            assert spike_hash == reference, f'{name} on {n_ranks} ranks: {spikes} spikes differ from one rank'
+            print(f'{n_ranks:>5} {name:>11} {t_run:>8.2f} {t_exchange:>12.3f}')
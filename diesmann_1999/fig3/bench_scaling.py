@@ -0,0 +1,61 @@
+import resource
+import subprocess
+import time
+
+import sys
+sys.path.append('..')  # shared synfire package lives in diesmann_1999/
+
+# Build time, run time, spike-exchange time and peak memory of the fig3-c
+# chain over a grid of widths (cells per layer) and depths (layers). The
+# connection probability is scaled to keep fig3's 10 inputs per cell and the
+# packet to drive 60% of the input layer, so a packet travels the same way
+# in every chain; the run lasts until it can have reached the last layer.
+# Every size runs in its own process, on n_ranks MPI ranks if given.
+# Spike exchange is the slowest rank's time in the spike exchange, 0 on one rank.
+# Run as `python bench_scaling.py [n_ranks]`.
+widths = [100, 1000, 10000]
+depths = [10, 30, 100]
+in_degree = 10
+stimulus = (0.6, 4, 27)  # (fraction of the input layer, s_in, seed)
+n_ranks = int(sys.argv[1]) if len(sys.argv) > 1 and sys.argv[1] != '--build' else 1
+
+def build(width, depth):
+    from neuron import h
+    h.nrnmpi_init()                       # before NetPyNE creates its ParallelContext
+    from netpyne import sim
+    from synfire.chain import SynfireChain
+
+    start = time.perf_counter()
+    chain = SynfireChain(n_layers=depth, layer_size=width, probability=min(1, in_degree / width), weight=0.001,
+                         delay=15, stim_amp=0.4, stim_dur=1, input_target='cell', t_mean=20, noise_std=0.3,
+                         duration=20 + 17.5 * depth + 20, dt=0.1)
+    built = time.perf_counter()
+    exchange = sim.pc.wait_time()
+    spkt, spkid = chain.run(int(stimulus[0] * width), *stimulus[1:])
+    ran = time.perf_counter()
+    exchange = sim.pc.allreduce(sim.pc.wait_time() - exchange, 2)
+    rss = sim.pc.allreduce(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+    if sim.rank == 0:
+        print(len(spkt), built - start, ran - built, exchange, int(rss))
+    sim.pc.barrier()
+    sim.pc.done()
+    h.quit()                              # finalizes MPI
+
+if sys.argv[1:2] == ['--build']:
+    build(int(sys.argv[2]), int(sys.argv[3]))
+    sys.exit()
+
+def run(width, depth):
+    command = [sys.executable, __file__, '--build', str(width), str(depth)]
+    if n_ranks > 1:
+        command = ['mpiexec', '-n', str(n_ranks)] + command
+    out = subprocess.run(command, capture_output=True, text=True, check=True)
+    spikes, t_build, t_run, t_exchange, rss = out.stdout.split()[-5:]
+    return int(spikes), float(t_build), float(t_run), float(t_exchange), int(rss)
+
+print(f'{n_ranks} rank(s)')
+print(f'{"width":>6} {"depth":>5} {"cells":>8} {"spikes":>8} {"build (s)":>9} {"run (s)":>8} {"exchange (s)":>12} {"MB":>7}')
+for depth in depths:
+    for width in widths:
+        spikes, t_build, t_run, t_exchange, rss = run(width, depth)
+        print(f'{width:>6} {depth:>5} {width * depth:>8} {spikes:>8} {t_build:>9.2f} {t_run:>8.2f} {t_exchange:>12.3f} {rss:>7}')
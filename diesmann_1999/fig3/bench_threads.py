@@ -0,0 +1,33 @@
+import os
+import time
+
+import numpy as np
+
+import sys
+sys.path.append('..')  # shared synfire package lives in diesmann_1999/
+from synfire.chain import SynfireChain
+
+# Wall time of one run of the 1,000-cell fig3-c chain on 1 to all cores.
+# Every thread count replays the same packet, so the spikes must be identical.
+# Run as `python bench_threads.py [max_threads]`.
+max_threads = int(sys.argv[1]) if len(sys.argv) > 1 else os.cpu_count()
+stimulus = (60, 4, 27)  # (a_in, s_in, seed)
+repeats = 3
+
+chain = SynfireChain(probability=0.1, weight=0.001, delay=15, stim_amp=0.4, stim_dur=1, input_target='cell',
+                     t_mean=20, noise_std=0.3, duration=200, dt=0.1)
+chain.run(*stimulus)  # warm up
+
+reference = None
+print(f'{"threads":>7} {"wall (s)":>9} {"speedup":>8} {"spikes":>7}')
+for n_threads in range(1, max_threads + 1):
+    chain.set_threads(n_threads)
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        spkt, spkid = chain.run(*stimulus)
+        times.append(time.perf_counter() - start)
+    if reference is None:
+        reference, t_serial = (spkt, spkid), min(times)
+    assert np.array_equal(spkt, reference[0]) and np.array_equal(spkid, reference[1]), f'{n_threads} threads changed the spikes'
+    print(f'{n_threads:>7} {min(times):>9.2f} {t_serial / min(times):>8.2f} {len(spkt):>7}')
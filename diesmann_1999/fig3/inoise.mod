@@ -17,9 +17,11 @@ ENDCOMMENT
 TITLE Guassian-White noise
 
 NEURON {
+	THREADSAFE : only true if every instance has its own Random or buffer
 	POINT_PROCESS INoise
 	RANGE i, std, tau, bias, del, dur, x
 	ELECTRODE_CURRENT i
+	POINTER donotuse, buffer
 }
 
 UNITS {
@@ -40,12 +42,16 @@ ASSIGNED {
 	iamp (nA)
 	noise (nA)
 	on (1)
+	donotuse
+	buffer
 }
 
 
 INITIAL {
 	i = 0
 	iamp = 0
+	noise = 0 : so a rerun does not start with the last draw of the previous one
+	n = 0
 }
 
 STATE {
@@ -53,9 +59,66 @@ STATE {
 }
 
 PROCEDURE seed(x) {
+	: seeds the shared generator, used by instances without their own Random
 	set_seed(x)
 }
 
+VERBATIM
+#ifndef NRN_VERSION_GTEQ_8_2_0
+/* declared by NEURON's own headers from 8.2 on */
+double nrn_random_pick(void* r);
+void* nrn_random_arg(int argpos);
+void* vector_arg(int);
+double* vector_vec(void*);
+int vector_capacity(void*);
+#endif
+ENDVERBATIM
+
+FUNCTION grand() {
+VERBATIM
+	if (_p_buffer) {
+		/* pre-drawn values, one per time step from del on */
+		/* t is a sum of steps, so round to the nearest one */
+		int k = (int)((t - del) / dt + 0.5);
+		_lgrand = (k >= 0 && k < vector_capacity(_p_buffer)) ? vector_vec(_p_buffer)[k] : 0.;
+	} else if (_p_donotuse) {
+		/* the instance's own stream; the Random must be set to .normal(0, 1) */
+		_lgrand = nrn_random_pick(_p_donotuse);
+	} else {
+		/* shared generator, only valid with a single thread */
+		_lgrand = normrand(0., 1.);
+	}
+ENDVERBATIM
+}
+
+PROCEDURE noiseFromRandom() {
+VERBATIM
+ {
+	void** pv = (void**)(&_p_donotuse);
+	if (ifarg(1)) {
+		*pv = nrn_random_arg(1);
+	} else {
+		*pv = (void*)0;
+	}
+ }
+ENDVERBATIM
+}
+
+PROCEDURE noiseFromBuffer() {
+	: noise is read from a Vector of unit normal values, one per time step
+	: starting at del, instead of drawn while integrating
+VERBATIM
+ {
+	void** pv = (void**)(&_p_buffer);
+	if (ifarg(1)) {
+		*pv = vector_arg(1);
+	} else {
+		*pv = (void*)0;
+	}
+ }
+ENDVERBATIM
+}
+
 BREAKPOINT {
 	at_time(del)
 	at_time(del+dur)
@@ -74,7 +137,7 @@ BREAKPOINT {
 }
 
 DERIVATIVE kin {
-	noise = normrand(0,std*1(/nA))*1(nA)
+	noise = grand()*std
 	n' = (-n + noise)
 	: n' = (-n + noise)
 }
\ No newline at end of file
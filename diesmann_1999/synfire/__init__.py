@@ -0,0 +1,15 @@
+"""Shared building blocks for the Diesmann et al. (1999) reproduction.
+
+The figure scripts in ``fig1``, ``fig2`` and ``fig3`` are run from their own
+directory (so NEURON picks up the compiled mechanisms in ``x86_64``) and add
+``..`` to ``sys.path`` to import this package.
+
+Every cell's noise comes from its own random stream keyed by its gid, and
+connections are drawn per gid pair. So for one network the spike trains
+and recorded traces are the same for any number of threads
+(``n_threads``), MPI ranks and split of the cells over them
+(``partition``, see ``partition.py``), and a fig3 stimulus gives the same
+spikes in any chain of a ``chain.SynfireChain`` batch (``n_chains``).
+These settings change the run time only, as ``tests/test_simrun.py`` and
+``tests/test_chain.py`` check.
+"""
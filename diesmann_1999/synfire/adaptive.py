@@ -0,0 +1,110 @@
+import contextlib
+
+import numpy as np
+
+from .single_cell import packet_response
+from .sweep import SweepPool, run_tasks, task_seed
+
+
+def alpha_interval(k, n, z=1.96):
+    """Wilson score interval for the firing probability alpha = k / n."""
+    p = k / n
+    denom = 1 + z**2 / n
+    center = (p + z**2 / (2 * n)) / denom
+    half = z * np.sqrt(p * (1 - p) / n + z**2 / (4 * n**2)) / denom
+    return center - half, center + half
+
+
+def s_out_interval(s_out, m, z=1.96):
+    """Normal-theory interval for the std of ``m`` output spike times, None if ``m < 2``."""
+    if m < 2:
+        return None
+    half = z * s_out / np.sqrt(2 * (m - 1))
+    return max(s_out - half, 0), s_out + half
+
+
+def converged(spike_times, alpha_width, s_out_width, z=1.96):
+    """True when the confidence intervals on alpha and (where defined) s_out
+    are narrower than the targets.
+    """
+    k = np.count_nonzero(spike_times)
+    lo, hi = alpha_interval(k, len(spike_times), z)
+    if hi - lo > alpha_width:
+        return False
+    interval = s_out_interval(packet_response(spike_times)[1], k, z)
+    return interval is None or interval[1] - interval[0] <= s_out_width
+
+
+def run_adaptive_sweep(a_in_values, s_in_values, batch_size=20, max_trials=200, alpha_width=0.15, s_out_width=0.5,
+                       root_seed=0, processes=None, experiment_params=None, cache=None, journal=None, pool=None):
+    """Like ``run_sweep``, but every grid point gets trials in batches of
+    ``batch_size`` until its estimates are tight enough or ``max_trials`` is
+    reached.
+
+    Points where the cell (almost) always or never fires stop after a couple
+    of batches, so the trials go to the transition region. Batches are seeded
+    like ``run_sweep`` batches of the same size, so both share cache entries.
+
+    Returns ``(alpha, s_out, n_trials)``, each of shape ``(len(a_in_values), len(s_in_values))``.
+
+    :param alpha_width: Target width of the confidence interval on alpha.
+    :param s_out_width: Target width of the confidence interval on s_out (ms).
+    :param journal: SweepJournal to resume from and append finished batches to.
+    :param pool: SweepPool to reuse across calls; a new one is made if None.
+    """
+    spikes = {(i, j): [] for i in range(len(a_in_values)) for j in range(len(s_in_values))}
+    active = sorted(spikes)
+    chunk = 0
+    with SweepPool(processes, experiment_params, batch_size) if pool is None else contextlib.nullcontext(pool) as pool:
+        while active:
+            tasks = []
+            for i, j in active:
+                a_in, s_in = a_in_values[i], float(s_in_values[j])
+                tasks.append((i, j, chunk, a_in, s_in, batch_size, task_seed(root_seed, a_in, s_in, chunk)))
+            for (i, j, _), spkts in run_tasks(tasks, pool, cache, journal).items():
+                spikes[i, j].append(spkts)
+
+            chunk += 1
+            active = [(i, j) for i, j in active
+                      if chunk * batch_size < max_trials
+                      and not converged(np.concatenate(spikes[i, j]), alpha_width, s_out_width)]
+
+    alpha = np.zeros((len(a_in_values), len(s_in_values)))
+    s_out = np.zeros_like(alpha)
+    n_trials = np.zeros_like(alpha, dtype=int)
+    for (i, j), batches in spikes.items():
+        spkts = np.concatenate(batches)
+        alpha[i, j], s_out[i, j] = packet_response(spkts)
+        n_trials[i, j] = len(spkts)
+    return alpha, s_out, n_trials
+
+
+def refine_alpha_curve(a_in_values, s_in, max_jump=0.1, max_points=150, batch_size=20, processes=None,
+                       experiment_params=None, **adaptive_params):
+    """alpha(a_in) at fixed ``s_in`` on a grid that is refined where the curve is steep.
+
+    Starts from the coarse ``a_in_values`` and keeps inserting the midpoint
+    of every interval whose alpha changes by more than ``max_jump`` until the
+    curve is resolved to single spikes or ``max_points`` points are used.
+
+    Returns ``(a_in, alpha, s_out, n_trials)`` sorted by a_in.
+
+    :param adaptive_params: Passed on to ``run_adaptive_sweep``.
+    """
+    results = {}
+    new = sorted(set(int(a_in) for a_in in a_in_values))
+    with SweepPool(processes, experiment_params, batch_size) as pool:
+        while new:
+            alpha, s_out, n_trials = run_adaptive_sweep(new, [s_in], batch_size=batch_size, pool=pool, **adaptive_params)
+            for k, a_in in enumerate(new):
+                results[a_in] = alpha[k, 0], s_out[k, 0], n_trials[k, 0]
+
+            grid = sorted(results)
+            new = [(lo + hi) // 2 for lo, hi in zip(grid[:-1], grid[1:])
+                   if hi - lo > 1 and abs(results[hi][0] - results[lo][0]) > max_jump]
+            new = new[:max(max_points - len(results), 0)]
+
+    grid = sorted(results)
+    alpha, s_out, n_trials = (np.array(column) for column in zip(*(results[a_in] for a_in in grid)))
+    return np.array(grid), alpha, s_out, n_trials
+
@@ -0,0 +1,122 @@
+import hashlib
+import io
+import json
+import sqlite3
+import time
+
+import numpy as np
+
+
+def params_hash(params):
+    """Stable hash of a JSON-like parameter dict."""
+    text = json.dumps(params, sort_keys=True, default=str)
+    return hashlib.sha1(text.encode()).hexdigest()
+
+
+def stim_params(a_in, s_in, seed, **extra):
+    """Normalized stimulus of one cached or journaled result."""
+    return {'a_in': int(a_in), 's_in': round(float(s_in), 9), 'seed': None if seed is None else int(seed), **extra}
+
+
+def _flatten(params, prefix=''):
+    flat = {}
+    for key, value in params.items():
+        if isinstance(value, dict):
+            flat.update(_flatten(value, f'{prefix}{key}.'))
+        else:
+            flat[f'{prefix}{key}'] = value
+    return flat
+
+
+class ResultCache:
+    """Simulation results stored in sqlite, keyed by a hash of the model
+    parameters plus the stimulus parameters and seed.
+
+    Entries written under other model hashes stay in the file (so switching
+    parameters back is free) but count toward ``max_bytes``; the least
+    recently used entries are evicted first.
+    """
+    def __init__(self, path, model_params, max_bytes=2**30):
+        """
+        :param path: sqlite file, created if missing.
+        :param model_params: Cell, synapse, noise and simulation parameters
+            that determine a result besides the stimulus.
+        :param max_bytes: Bound on the total size of stored results.
+        """
+        self.model_params = json.loads(json.dumps(model_params, default=str))
+        self.model_hash = params_hash(self.model_params)
+        self.max_bytes = max_bytes
+        self._db = sqlite3.connect(path)
+        self._db.executescript('''
+            CREATE TABLE IF NOT EXISTS models (model_hash TEXT PRIMARY KEY, params TEXT);
+            CREATE TABLE IF NOT EXISTS results (
+                model_hash TEXT, stim_hash TEXT, stim TEXT, value BLOB, size INTEGER, accessed REAL,
+                PRIMARY KEY (model_hash, stim_hash));
+        ''')
+        self._db.execute('INSERT OR IGNORE INTO models VALUES (?, ?)', (self.model_hash, json.dumps(self.model_params, sort_keys=True)))
+        self._db.commit()
+
+    def get(self, a_in, s_in, seed, **extra):
+        """Stored arrays for this stimulus as a tuple, or None on a miss."""
+        stim_hash = params_hash(stim_params(a_in, s_in, seed, **extra))
+        row = self._db.execute('SELECT value FROM results WHERE model_hash = ? AND stim_hash = ?',
+                               (self.model_hash, stim_hash)).fetchone()
+        if row is None:
+            return None
+        self._db.execute('UPDATE results SET accessed = ? WHERE model_hash = ? AND stim_hash = ?',
+                         (time.time(), self.model_hash, stim_hash))
+        self._db.commit()
+        with np.load(io.BytesIO(row[0])) as data:
+            return tuple(data[f'arr_{i}'] for i in range(len(data.files)))
+
+    def put(self, a_in, s_in, seed, *arrays, **extra):
+        """Store ``arrays`` for this stimulus and evict old entries if over budget."""
+        stim = stim_params(a_in, s_in, seed, **extra)
+        buf = io.BytesIO()
+        np.savez(buf, *[np.asarray(a) for a in arrays])
+        value = buf.getvalue()
+        self._db.execute('INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?)',
+                         (self.model_hash, params_hash(stim), json.dumps(stim), value, len(value), time.time()))
+        self._evict()
+        self._db.commit()
+
+    def _evict(self):
+        total = self._db.execute('SELECT COALESCE(SUM(size), 0) FROM results').fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        rows = self._db.execute('SELECT model_hash, stim_hash, size FROM results ORDER BY accessed').fetchall()
+        for model_hash, stim_hash, size in rows:
+            if total <= self.max_bytes:
+                break
+            self._db.execute('DELETE FROM results WHERE model_hash = ? AND stim_hash = ?', (model_hash, stim_hash))
+            total -= size
+
+    def invalidation_report(self):
+        """Entries that no longer match the current model parameters.
+
+        Returns one dict per stale model hash with its entry count, size and
+        the parameters that differ from the current ones (as (old, new)).
+        """
+        current = _flatten(self.model_params)
+        report = []
+        rows = self._db.execute('''SELECT m.model_hash, m.params, COUNT(r.stim_hash), COALESCE(SUM(r.size), 0)
+                                   FROM models m JOIN results r ON r.model_hash = m.model_hash
+                                   WHERE m.model_hash != ? GROUP BY m.model_hash''', (self.model_hash,)).fetchall()
+        for model_hash, params, entries, size in rows:
+            old = _flatten(json.loads(params))
+            changed = {key: (old.get(key), current.get(key)) for key in sorted(set(old) | set(current))
+                       if old.get(key) != current.get(key)}
+            report.append({'model_hash': model_hash, 'entries': entries, 'bytes': size, 'changed': changed})
+        return report
+
+    def print_invalidation_report(self):
+        for stale in self.invalidation_report():
+            print(f"cache: {stale['entries']} results ({stale['bytes']} bytes) from model {stale['model_hash'][:8]} are stale:")
+            for key, (old, new) in stale['changed'].items():
+                print(f'    {key}: {old} -> {new}')
+
+    def purge_stale(self):
+        """Delete every entry that was computed with other model parameters."""
+        self._db.execute('DELETE FROM results WHERE model_hash != ?', (self.model_hash,))
+        self._db.execute('DELETE FROM models WHERE model_hash != ?', (self.model_hash,))
+        self._db.commit()
@@ -0,0 +1,290 @@
+from netpyne import specs, sim
+import numpy as np
+from neuron import h
+
+from .cache import ResultCache
+from .connectivity import ConnectivityCache
+from .model import soma_secs, EXC_SYN, add_chain, pulse_packet_times
+from .inputs import PulseCurrent, NOISE_TYPES
+from .simrun import create_network, gathered_spikes, save_outputs, pre_run, set_threads, thin_traces
+from .spikes import PacketTracker
+
+
+class SynfireChain:
+    """The fig3 synfire chain, built once and re-driven with a new pulse
+    packet on every run.
+
+    Layer ``Neuron_0`` receives the packet as current pulses and every
+    layer is randomly connected to the next. Cells, connections and noise
+    sources are created once; a run only swaps the
+    input layer's pulse times and reseeds the noise.
+
+    With ``n_chains > 1`` the model holds that many copies of the chain in
+    consecutive gid blocks, each connected like the first (see
+    ``model.add_chain``'s ``gid_shift``), and ``run_many`` drives them with
+    one packet each in a single run.
+
+    Every cell's noise source has its own random stream, keyed by its gid
+    within the chain and the seed of the chain's stimulus, so the model can
+    be split over ``n_threads`` threads of one process without changing the
+    result, and a stimulus gives the same spikes in whichever chain and
+    batch it runs.
+    """
+    def __init__(self, n_layers=10, layer_size=100, probability=0.1, weight=0.001, delay=15, stim_amp=0.4, stim_dur=1,
+                 input_target='cell', t_mean=20, noise_std=0.3, noise='inoise', duration=200, dt=0.1, n_chains=1,
+                 n_threads=1, record_traces=False, conn_cache=None, partition=None):
+        """
+        :param n_layers: Number of layers including the input layer.
+        :param layer_size: Number of cells per layer.
+        :param probability: Connection probability between consecutive layers.
+        :param weight: Weight of the layer-to-layer synapses (uS).
+        :param delay: Delay of the layer-to-layer synapses (ms).
+        :param stim_amp: Current injected by each input spike (nA).
+        :param stim_dur: Duration of the current pulse of each input spike (ms).
+        :param input_target: 'cell' (input spike k drives input cell k, as in fig3-c)
+            or 'all' (every driven input cell gets the whole packet, as in fig3-a/b).
+        :param t_mean: Center of the input pulse packet (ms).
+        :param noise_std: Standard deviation of the background noise current (nA).
+        :param noise: 'inoise' (drawn by INoise on every step) or 'buffer' (drawn
+            for the whole run with NumPy before it starts, see inputs.BufferedNoise).
+        :param duration: Duration of each run (ms).
+        :param dt: Integration time step (ms).
+        :param n_chains: Number of copies of the chain in the model.
+        :param n_threads: Number of threads the cells are distributed over.
+        :param record_traces: Record V_soma of every cell (for ``run(save=True)``).
+        :param conn_cache: ConnectivityCache the layer-to-layer connections are
+            loaded from if this chain was built before, and stored in otherwise.
+        :param partition: How the cells are split over MPI ranks: 'layers'
+            (consecutive layers together, see partition.layer_partition),
+            'round_robin' or None (NetPyNE's round-robin).
+        """
+        self.n_layers = n_layers
+        self.layer_size = layer_size
+        self.input_target = input_target
+        self.t_mean = t_mean
+        self.noise_std = noise_std
+        self.duration = duration
+        self.n_chains = n_chains
+        self.chain_size = n_layers * layer_size
+
+        # Network parameters, one block of layers per chain
+        netParams = specs.NetParams()
+        netParams.cellParams['E'] = {'secs': soma_secs()}
+        netParams.synMechParams['exc'] = dict(EXC_SYN)
+        for c in range(n_chains):
+            add_chain(netParams, n_layers, layer_size, probability, weight, delay, pop=self._pop(c, '{}'),
+                      y=c * n_layers * 100, gid_shift=c * self.chain_size)
+
+        # Simulation options
+        simConfig = specs.SimConfig()
+        simConfig.duration = duration
+        simConfig.dt = dt
+        simConfig.verbose = False
+        simConfig.recordStep = 0.5
+        simConfig.filename = 'fig3'
+        simConfig.savePickle = False
+        if record_traces:
+            simConfig.recordTraces = {'V_soma':{'sec':'soma','loc':0.5,'var':'v'}}
+            simConfig.recordCells = ['all']
+        simConfig.analysis['plotRaster'] = {'orderBy': 'y', 'orderInverse': True, 'saveFig': True}  # drawn by run(save=True)
+
+        create_network(netParams, simConfig, conn_cache, partition)
+
+        self._inputs = {}
+        self._noises = {}
+        for cell in sim.net.cells:
+            seg = cell.secs['soma']['hObj'](0.5)
+            if cell.gid % self.chain_size < layer_size:
+                self._inputs[cell.gid] = PulseCurrent(seg, amp=stim_amp, dur=stim_dur)
+
+            # noise stimulation
+            noise_params = {'dt': dt} if noise == 'buffer' else {}
+            self._noises[cell.gid] = NOISE_TYPES[noise](seg, cell.gid % self.chain_size, std=noise_std, dur=duration, **noise_params)
+
+        self.set_threads(n_threads)
+        pre_run()
+
+    def set_threads(self, n_threads):
+        """Distribute the cells over ``n_threads`` threads for the following runs."""
+        set_threads(n_threads)
+
+    def _pop(self, c, i):
+        # a single chain keeps the fig3 population names
+        return f'Neuron_{i}' if self.n_chains == 1 else f'Chain{c}_Neuron_{i}'
+
+    @property
+    def layer_starts(self):
+        """First gid of every layer of a chain, counted from the chain's first gid."""
+        return np.arange(self.n_layers) * self.layer_size
+
+    def layer_gids(self, i, chain=0):
+        """Range of the gids in layer ``i`` (0 is the input layer) of ``chain``."""
+        start = chain * self.chain_size + i * self.layer_size
+        return range(start, start + self.layer_size)
+
+    def run(self, a_in, s_in, seed=None, n_driven=None, save=False, tracker=None):
+        """Drive the chain with one pulse packet and return the spike times
+        and gids of all cells as arrays.
+
+        :param seed: Seeds both the pulse packet and the noise streams.
+        :param n_driven: With input_target 'all', only the first ``n_driven``
+            input cells get the packet and noise; the others stay silent.
+        :param save: Write fig3 data and draw the raster after the run.
+        :param tracker: PacketTracker fed while the run is advanced from one
+            layer window to the next; the run ends when it is done.
+        """
+        trackers = None if tracker is None else [tracker]
+        return self.run_many([(a_in, s_in, seed, n_driven)], save, trackers)[0]
+
+    def run_many(self, stimuli, save=False, trackers=None):
+        """Drive chain ``c`` with ``stimuli[c]`` and return the spike times and
+        gids of every chain, with gids counted from the chain's first gid.
+
+        Chains without a stimulus get no input. The noise streams of each
+        chain are seeded by its own stimulus and every chain is connected
+        alike, so a stimulus gives the same spikes alone and in a batch.
+
+        :param stimuli: ``(a_in, s_in, seed)`` or ``(a_in, s_in, seed, n_driven)`` per chain.
+        :param save: Write fig3 data and draw the raster after the run.
+        :param trackers: PacketTracker per stimulus; the run ends when all are done.
+        """
+        stimuli = [tuple(stim) + (None,) * (4 - len(stim)) for stim in stimuli]
+        packets = [pulse_packet_times(a_in, s_in, t_mean=self.t_mean, t_stop=self.duration, seed=seed)
+                   for a_in, s_in, seed, _ in stimuli]
+        for gid, source in self._inputs.items():
+            c, k = divmod(gid, self.chain_size)
+            packet = packets[c] if c < len(stimuli) else packets[0][:0]
+            n_driven = self.layer_size if c >= len(stimuli) or stimuli[c][3] is None else stimuli[c][3]
+            if self.input_target == 'cell':
+                source.set_times(packet[k:k + 1])
+            else:
+                source.set_times(packet if k < n_driven else [])
+                self._noises[gid].std = self.noise_std if k < n_driven else 0
+
+        for gid, noise in self._noises.items():
+            c = gid // self.chain_size
+            if c < len(stimuli) and stimuli[c][2] is not None:
+                noise.seed(stimuli[c][2])
+        sim.simData['spkt'].resize(0)
+        sim.simData['spkid'].resize(0)
+
+        if trackers is None:
+            sim.runSim(skipPreRun=True)       # run parallel Neuron simulation
+        else:
+            self._run_tracked(trackers)
+        thin_traces()
+        if save:
+            save_outputs(plot=True)           # gather, save and plot spike raster
+        return self._split(*gathered_spikes(), len(stimuli))
+
+    def _split(self, spkt, spkid, n):
+        # spikes of the first n chains, with chain-local gids
+        chain = spkid // self.chain_size
+        return [(spkt[chain == c], spkid[chain == c] - c * self.chain_size) for c in range(n)]
+
+    def _run_tracked(self, trackers):
+        def update(t):
+            spikes = self._split(*gathered_spikes(), len(trackers))
+            return all([tracker.update(spkt, spkid, t) for tracker, (spkt, spkid) in zip(trackers, spikes)])
+
+        h.finitialize(float(sim.cfg.hParams['v_init']))
+        while not update(h.t + sim.cfg.dt / 2):   # psolve may stop just short of the target
+            if h.t >= self.duration - sim.cfg.dt / 2:
+                update(np.inf)                    # windows reaching past the end of the run
+                break
+            sim.pc.psolve(min(min(tracker.next_stop for tracker in trackers), self.duration))
+
+
+class ChainRuns:
+    """Packet trajectories through a SynfireChain, cached in a ResultCache.
+
+    The chain is built by the first run missing from the cache and re-driven
+    afterwards, running ``n_chains`` stimuli at once. With a
+    layer window in the analysis parameters each layer's packet is extracted
+    as soon as its window closes and a run stops once the packet has died
+    out; without one, every layer is analysed at the end of the run.
+    """
+    def __init__(self, model_params, cache, conn_cache=None, n_threads=1, n_chains=1, partition=None):
+        """
+        :param model_params: Fig3 model parameters: SynfireChain keyword
+            arguments under 'chain' and PacketTracker ones under 'analysis',
+            where 'window' is the half-width (ms) of every layer's window, or
+            None for no windows.
+        :param cache: ResultCache of ``model_params`` the trajectories are kept in.
+        :param conn_cache: ConnectivityCache for the chain's connections.
+        :param n_threads: Number of threads the chain is simulated with.
+        :param n_chains: Number of copies of the chain simulated side by side;
+            like ``n_threads`` it changes the run time, not the results.
+        :param partition: How the cells are split over MPI ranks, see ``simrun.create_network``.
+        """
+        self.model_params = model_params
+        self.cache = cache
+        self.conn_cache = conn_cache
+        self.n_threads = n_threads
+        self.n_chains = n_chains
+        self.partition = partition
+        self.chain = None
+
+    def new_tracker(self):
+        """PacketTracker for one run of the chain."""
+        analysis = dict(self.model_params['analysis'])
+        window = analysis.pop('window')
+        windows = None
+        if window is not None:
+            windows = [(17.5 * i - window, 17.5 * i + window) for i in range(1, self.chain.n_layers + 1)]
+        return PacketTracker(self.chain.layer_starts, windows, **analysis)
+
+    def run_packets(self, stimuli, save=False):
+        """Packet std and size per layer of every stimulus, as
+        ``(stdvar_array, spike_count_array)``, or 0 for a run without spikes.
+
+        :param stimuli: ``(a_in, s_in, seed)`` or ``(a_in, s_in, seed, n_driven)``
+            per run; ``n_driven`` is part of the cache key as ``initial_spike_a``.
+        :param save: Simulate even cached stimuli, write fig3 data and draw the raster.
+        """
+        def key(stim):
+            return {} if len(stim) < 4 else {'initial_spike_a': stim[3]}
+
+        results = {stim: self.cache.get(*stim[:3], **key(stim)) for stim in stimuli}
+        todo = [stim for stim, cached in results.items() if cached is None or save]
+        if todo and self.chain is None:
+            self.chain = SynfireChain(**self.model_params['chain'], n_chains=self.n_chains, n_threads=self.n_threads,
+                                      conn_cache=self.conn_cache, partition=self.partition)
+
+        for start in range(0, len(todo), self.chain.n_chains if todo else 1):
+            batch = todo[start:start + self.chain.n_chains]
+            trackers = [self.new_tracker() for _ in batch]
+            for stim, tracker, (spkt, _) in zip(batch, trackers, self.chain.run_many(batch, save, trackers)):
+                if len(spkt) == 0:
+                    results[stim] = 0
+                    continue
+
+                stdvar_array = [np.std(packet) for packet in tracker.packets]
+                spike_count_array = [len(packet) for packet in tracker.packets]
+                self.cache.put(*stim[:3], stdvar_array, spike_count_array, **key(stim))
+                results[stim] = stdvar_array, spike_count_array
+        return [results[stim] for stim in stimuli]
+
+    def run_single_packet(self, a_in, s_in, seed, n_driven=None, save=False):
+        """``run_packets`` for a single stimulus."""
+        stim = (a_in, s_in, seed) if n_driven is None else (a_in, s_in, seed, n_driven)
+        return self.run_packets([stim], save)[0]
+
+
+def figure_runs(name, model_params, n_threads=1, partition='layers', n_chains=1, conn_cache='conn_cache'):
+    """ChainRuns with the run settings of the fig3 scripts.
+
+    Finished runs are cached in ``<name>_cache.sqlite``, whose invalidation
+    report is printed, so re-plotting only simulates what changed.
+
+    :param name: Name of the figure, e.g. 'fig3_a'.
+    :param conn_cache: Directory of the ConnectivityCache the chain's
+        connections are kept in, or None to draw them for every chain.
+
+    The other parameters are those of ``ChainRuns``.
+    """
+    cache = ResultCache(f'{name}_cache.sqlite', model_params)
+    cache.print_invalidation_report()
+    if conn_cache is not None:
+        conn_cache = ConnectivityCache(conn_cache)
+    return ChainRuns(model_params, cache, conn_cache, n_threads, n_chains, partition)
@@ -0,0 +1,301 @@
+import json
+import os
+from numbers import Number
+
+import numpy as np
+from netpyne import sim
+from netpyne.specs import Dict
+from netpyne.specs.netParams import SynMechParams
+from neuron import h
+
+from .cache import params_hash
+
+
+# keys NetPyNE sets on a connection made from a plain conn rule; a network
+# with any other (plasticity, weight shapes, pointer conns) is not cached
+CONN_KEYS = {'preGid', 'sec', 'loc', 'synMech', 'weight', 'delay', 'label', 'preLoc', 'hObj'}
+
+# keys of a conn rule that prob_conns can generate; rules with any other
+# (string functions, convergence, plasticity, ...) are left to NetPyNE
+PROB_RULE_KEYS = {'preConds', 'postConds', 'probability', 'weight', 'delay', 'synMech', 'sec', 'loc', 'connFunc',
+                  'gidShift'}
+
+# simConfig options that change which connections a rule makes
+CONN_OPTIONS = ('allowSelfConns', 'allowConnsWithWeight0', 'includeParamsLabel')
+
+
+def _has_netpyne_internals():
+    # private NetPyNE functions connect_cells builds on (as in NetPyNE 1.1);
+    # a release without them connects every rule through NetPyNE itself
+    return hasattr(sim, '_gatherAllCellTags') and hasattr(sim.net, '_findPrePostCellsCondition')
+
+
+def conn_key(netParams, simConfig):
+    """Hash of everything the connections drawn from ``netParams.connParams`` depend on.
+
+    That is the conn rules, the population layout (populations, network
+    size and the other global ``netParams`` values that string functions
+    may refer to, section and synapse names) and the ``conn`` and ``loc``
+    seeds. Rules with Python functions hash by their ``str``, which is new
+    in every process, so such a network is never found in the cache.
+    """
+    net = netParams.todict()
+    return params_hash({
+        'conns': net['connParams'],
+        'pops': net['popParams'],
+        'cells': {label: sorted(cell.get('secs', {})) for label, cell in net['cellParams'].items()},
+        'synMechs': sorted(net['synMechParams']),
+        'net': {key: value for key, value in net.items() if not key.startswith('_') and not isinstance(value, dict)},
+        'seeds': {'conn': simConfig.seeds['conn'], 'loc': simConfig.seeds['loc']},
+        'options': {name: getattr(simConfig, name) for name in CONN_OPTIONS},
+    })
+
+
+def conn_table():
+    """Connections of the cells on this rank as columns, or None if some
+    cannot be re-created from (pre gid, post gid, sec, loc, synMech, weight,
+    delay, label) alone."""
+    if sim.net.params.subConnParams or sim.net.params.synMechParams.hasPointerConns():
+        return None
+    rows = []
+    for cell in sim.net.cells:
+        if any('weightNorm' in sec for sec in cell.secs.values()):
+            return None                   # addConn would scale the stored weights again
+        for conn in cell.conns:
+            if set(conn) - CONN_KEYS or not isinstance(conn.get('preGid'), int):
+                return None
+            rows.append((conn['preGid'], cell.gid, conn['sec'], conn['loc'], conn['synMech'], conn['weight'],
+                         conn['delay'], conn.get('label')))
+    return rows
+
+
+def save_conns(path, rows):
+    """Write connection rows from ``conn_table`` to ``path`` (.npz), sorted by post and pre gid."""
+    rows = sorted(rows, key=lambda row: (row[1], row[0]))
+    names = {}
+    columns = {}
+    for i, field in enumerate(('pre', 'post', 'sec', 'loc', 'synMech', 'weight', 'delay', 'label')):
+        values = [row[i] for row in rows]
+        if field in ('sec', 'synMech', 'label'):
+            # few distinct names, stored once and referenced by index
+            names[field] = list(dict.fromkeys(values))
+            index = {name: k for k, name in enumerate(names[field])}
+            values = [index[value] for value in values]
+            columns[field] = np.array(values, dtype=np.int16)
+        elif field in ('pre', 'post'):
+            columns[field] = np.array(values, dtype=np.int32)
+        else:
+            columns[field] = np.array(values, dtype=float)
+    tmp = path + '.tmp.npz'
+    np.savez(tmp, names=json.dumps(names), **columns)
+    os.replace(tmp, path)                 # readers never see a half-written table
+
+
+def load_conns(path):
+    """Add the connections stored at ``path`` that target cells on this rank."""
+    with np.load(path) as data:
+        names = json.loads(str(data['names']))
+        columns = {field: data[field] for field in data.files if field != 'names'}
+    local = np.isin(columns['post'], list(sim.net.gid2lid))
+    for i in np.flatnonzero(local):
+        params = {'preGid': int(columns['pre'][i]),
+                  'sec': names['sec'][columns['sec'][i]],
+                  'loc': float(columns['loc'][i]),
+                  'synMech': names['synMech'][columns['synMech'][i]],
+                  'weight': float(columns['weight'][i]),
+                  'delay': float(columns['delay'][i]),
+                  'synsPerConn': 1}
+        label = names['label'][columns['label'][i]]
+        if label is not None:
+            params['label'] = label
+        sim.net.cells[sim.net.gid2lid[int(columns['post'][i])]].addConn(params)
+    return int(local.sum())
+
+
+def prob_conns(pre_gids, post_gids, probability, seed, block=2**22):
+    """Connections of a fixed-probability rule in CSR form.
+
+    Returns ``(pre_gids, post_gids, indptr, indices)`` with both gid lists
+    sorted; post cell ``post_gids[i]`` receives from
+    ``pre_gids[indices[indptr[i]:indptr[i + 1]]]``, in gid order.
+
+    The uniform numbers are those of NetPyNE's ``probConn`` (one per
+    pre/post pair, pre-major, from a Random123 stream keyed by the hashes of
+    both gid lists and the conn seed), so the connections are identical.
+    They are drawn ``block`` at a time into a vector and compared in NumPy
+    instead of going through a dict of every pair.
+    """
+    pre_gids, post_gids = np.sort(pre_gids), np.sort(post_gids)
+    n_post = len(post_gids)
+    rand = h.Random()
+    rand.Random123(sim.hashList(pre_gids.tolist()), sim.hashList(post_gids.tolist()), seed)
+    rand.uniform(0, 1)                    # takes sequence 0, NetPyNE's first pair is at 1
+    vec = h.Vector()
+    pres, posts = [], []
+    rows = max(1, block // n_post)
+    for start in range(0, len(pre_gids), rows):
+        n = min(rows, len(pre_gids) - start)
+        rand.seq(start * n_post + 1)
+        vec.resize(n * n_post)
+        vec.setrand(rand)
+        i, j = np.nonzero(vec.as_numpy().reshape(n, n_post) <= probability)
+        pres.append(i + start)
+        posts.append(j)
+    pre, post = np.concatenate(pres), np.concatenate(posts)
+    order = np.lexsort((pre, post))
+    indptr = np.concatenate(([0], np.cumsum(np.bincount(post, minlength=n_post))))
+    return pre_gids, post_gids, indptr, pre[order]
+
+
+def _is_prob_rule(rule):
+    return (set(rule) <= PROB_RULE_KEYS and rule.get('connFunc', 'probConn') == 'probConn'
+            and isinstance(rule.get('probability'), Number)
+            and all(isinstance(rule.get(key), (Number, type(None))) for key in ('weight', 'delay', 'loc'))
+            and all(isinstance(rule.get(key), (str, type(None))) for key in ('synMech', 'sec')))
+
+
+def _copy(conn):
+    # Dict(conn) converts nested dicts on every copy; connections hold none
+    copy = Dict()
+    dict.update(copy, conn)
+    return copy
+
+
+def _add_conns(cell, pre_gids, params):
+    # the first connection goes through addConn, which picks the section and
+    # synapse and scales the weight; the others copy it, each with a synapse
+    # of its own as addConn makes them with oneSynPerNetcon
+    if not sim.cfg.allowSelfConns:
+        pre_gids = pre_gids[pre_gids != cell.gid]
+    if len(pre_gids) == 0:
+        return
+    n_conns = len(cell.conns)
+    cell.addConn(dict(params, preGid=int(pre_gids[0])))
+    if len(cell.conns) == n_conns:
+        return                            # not made, e.g. weight 0
+    first = cell.conns[-1]
+    sec = cell.secs.get(first.get('sec'), {})
+    syn = first['hObj'].syn() if first.get('hObj') is not None else None
+    syn_mech = next((mech for mech in reversed(sec.get('synMechs', [])) if syn is not None and mech.get('hObj') == syn), None)
+    string_funcs = getattr(sim.net.params, '_synMechStringFuncs', None)    # set by sim.setNetParams
+    if (syn_mech is None or not sim.cfg.createPyStruct or string_funcs is None or string_funcs.get(syn_mech['label'])
+            or {'selfNetcon', 'selfNetCon', 'pointerParams'} & set(syn_mech)
+            or any(s.get('pointps') for s in cell.secs.values())):
+        for pre in pre_gids[1:]:
+            cell.addConn(dict(params, preGid=int(pre)))
+        return
+
+    syn_params = {name: value for name, value in sim.net.params.synMechParams[syn_mech['label']].items()
+                  if name not in SynMechParams.reservedKeys()}
+    for pre in pre_gids[1:].tolist():
+        if sim.cfg.oneSynPerNetcon:
+            mech = _copy(syn_mech)
+            mech['hObj'] = getattr(h, syn_mech['mod'])(syn_mech['loc'], sec=sec['hObj'])
+            for name, value in syn_params.items():
+                setattr(mech['hObj'], name, value)
+            sec['synMechs'].append(mech)
+            syn = mech['hObj']
+        netcon = sim.pc.gid_connect(pre, syn)
+        netcon.weight[0] = first['weight']
+        netcon.delay = first['delay']
+        conn = _copy(first)
+        conn['preGid'] = pre
+        conn['hObj'] = netcon
+        cell.conns.append(conn)
+
+
+def connect_cells():
+    """``sim.net.connectCells`` with the fixed-probability rules generated by ``prob_conns``.
+
+    Rules with a numeric probability, weight, delay and loc are sampled
+    whole in NumPy and their connections added one post cell at a time;
+    NetPyNE connects the other rules as usual, and all of them if this
+    NetPyNE lacks the private functions used to select the cells. The
+    connections are the ones NetPyNE would make.
+
+    A rule may also set 'gidShift' (not a NetPyNE key): its connections are
+    drawn as for the pre and post gids that much lower, so a population
+    block connected by such rules repeats the connections of the block
+    ``gidShift`` gids before it.
+    """
+    params = sim.net.params
+    rules = params.connParams
+    fast = {}
+    if _has_netpyne_internals() and not params.subConnParams and not params.synMechParams.hasPointerConns():
+        fast = {label: rule for label, rule in rules.items() if _is_prob_rule(rule)}
+    shifted = [label for label, rule in rules.items() if 'gidShift' in rule and label not in fast]
+    if shifted:
+        raise ValueError(f'conn rules {shifted} set gidShift but cannot be drawn by prob_conns')
+    if fast:
+        if sim.nhosts > 1:
+            all_tags = sim._gatherAllCellTags()
+        else:
+            all_tags = {cell.gid: cell.tags for cell in sim.net.cells}
+        for label, rule in fast.items():
+            pre_tags, post_tags = sim.net._findPrePostCellsCondition(all_tags, rule['preConds'], rule['postConds'])
+            if not pre_tags or not post_tags:
+                continue
+            conn = {'sec': rule.get('sec'), 'loc': rule.get('loc'), 'synMech': rule.get('synMech'),
+                    'weight': rule.get('weight'), 'delay': rule.get('delay'), 'synsPerConn': 1}
+            if sim.cfg.includeParamsLabel:
+                conn['label'] = label
+            shift = rule.get('gidShift', 0)
+            pre_gids, post_gids, indptr, indices = prob_conns(np.array(list(pre_tags)) - shift,
+                                                              np.array(list(post_tags)) - shift,
+                                                              rule['probability'], sim.cfg.seeds['conn'])
+            pre_gids, post_gids = pre_gids + shift, post_gids + shift
+            for i, post in enumerate(post_gids.tolist()):
+                if post in sim.net.gid2lid:
+                    _add_conns(sim.net.cells[sim.net.gid2lid[post]], pre_gids[indices[indptr[i]:indptr[i + 1]]], conn)
+    params.connParams = {label: rule for label, rule in rules.items() if label not in fast}
+    try:
+        return sim.net.connectCells()     # the remaining rules
+    finally:
+        params.connParams = rules
+
+
+class ConnectivityCache:
+    """Instantiated connections stored per network, so rebuilding the same
+    network loads them instead of drawing every conn rule again.
+
+    Each network is one ``<conn_key>.npz`` table of (pre gid, post gid,
+    sec, loc, synMech, weight, delay) in ``path``. Any change to the conn
+    rules, the population layout or the ``conn``/``loc`` seeds gives a new
+    key, and networks whose connections carry more than these fields are
+    connected by NetPyNE as usual and not stored.
+    """
+    def __init__(self, path):
+        """
+        :param path: Directory of the stored tables, created if missing.
+        """
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+
+    def file(self, netParams, simConfig):
+        """Table the network of ``netParams`` and ``simConfig`` is stored in."""
+        return os.path.join(self.path, conn_key(netParams, simConfig) + '.npz')
+
+    def connect(self):
+        """``sim.net.connectCells`` for the network being created, loading its
+        connections if stored and storing them otherwise.
+
+        Returns True if the connections were loaded.
+        """
+        path = self.file(sim.net.params, sim.cfg)
+        if os.path.exists(path):
+            sim.timing('start', 'connectTime')
+            n_conns = load_conns(path)
+            if sim.cfg.verbose:
+                print(f'  Loaded {n_conns} connections on node {sim.rank} from {path}')
+            sim.pc.barrier()
+            sim.timing('stop', 'connectTime')
+            return True
+
+        connect_cells()
+        rows = conn_table()
+        if sim.nhosts > 1:
+            parts = sim.pc.py_allgather(rows)
+            rows = None if any(part is None for part in parts) else [row for part in parts for row in part]
+        if sim.rank == 0 and rows is not None:
+            save_conns(path, rows)
+        return False
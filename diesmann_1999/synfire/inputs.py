@@ -0,0 +1,172 @@
+import numpy as np
+from neuron import h
+
+from .model import EXC_SYN
+
+
+class PulseCurrent:
+    """Pulse-packet input delivered as current: every input spike injects
+    ``amp`` nA for ``dur`` ms, like one IClamp per spike.
+
+    A single IClamp is used and its amplitude is played from a vector holding
+    the summed pulses, so the object count does not depend on the packet size.
+    """
+    def __init__(self, seg, amp=0.4, dur=1):
+        """
+        :param seg: Segment the clamp is placed in.
+        :param amp: Current injected by each input spike (nA).
+        :param dur: Duration of the current pulse of each input spike (ms).
+        """
+        self.amp = amp
+        self.dur = dur
+        self._iclamp = h.IClamp(seg)
+        self._iclamp.delay = 0
+        self._iclamp.dur = 1e9
+        self._tvec = h.Vector([0])
+        self._ivec = h.Vector([0])
+        self._ivec.play(self._iclamp._ref_amp, self._tvec)
+
+    def set_times(self, spike_times):
+        """Replace the input with the summed current pulses of ``spike_times``."""
+        spike_times = np.asarray(spike_times, dtype=float)
+        edges = np.round(np.concatenate((spike_times, spike_times + self.dur)), 6)
+        steps = np.concatenate((np.full(len(spike_times), self.amp), np.full(len(spike_times), -self.amp)))
+        t, idx = np.unique(edges, return_inverse=True)
+        amp = np.cumsum(np.bincount(idx, weights=steps, minlength=len(t)))
+        self._tvec.from_python(np.concatenate(([0], t)))
+        self._ivec.from_python(np.concatenate(([0], np.round(amp, 9))))
+
+
+class PulseSynapse:
+    """Pulse-packet input delivered through a synapse: the sorted spike times
+    are played by one VecStim through one NetCon into an Exp2Syn.
+
+    Needs ``vecevent.mod`` compiled in the working directory.
+    """
+    def __init__(self, seg, weight=0.001, delay=0, syn_params=EXC_SYN):
+        """
+        :param seg: Segment the synapse is placed in.
+        :param weight: Weight of the NetCon (uS).
+        :param delay: Delay of the NetCon (ms).
+        :param syn_params: Exp2Syn parameters, in NetPyNE synMechParams format.
+        """
+        self._syn = h.Exp2Syn(seg)
+        self._syn.tau1 = syn_params['tau1']
+        self._syn.tau2 = syn_params['tau2']
+        self._syn.e = syn_params['e']
+        self._tvec = h.Vector()
+        self._vecstim = h.VecStim()
+        self._vecstim.play(self._tvec)
+        self._nc = h.NetCon(self._vecstim, self._syn)
+        self._nc.weight[0] = weight
+        self._nc.delay = delay
+
+    def set_times(self, spike_times):
+        """Replace the played spike train; takes effect at the next finitialize."""
+        spike_times = np.sort(np.asarray(spike_times, dtype=float))
+        # VecStim cannot send two events at the same time, so coincident
+        # spikes (packets are rounded to 0.1 ms) are spread by 1 ns each
+        _, first, counts = np.unique(spike_times, return_index=True, return_counts=True)
+        rank = np.arange(len(spike_times)) - np.repeat(first, counts)
+        self._tvec.from_python(spike_times + rank * 1e-6)
+
+
+class NoiseCurrent:
+    """INoise background current drawing from its own random stream.
+
+    Every source owns an ``h.Random`` attached with ``noiseFromRandom``, so
+    no generator state is shared between cells and the model can run with
+    ``ParallelContext.nthread`` > 1. The generator is Random123, a counter
+    based generator keyed by (gid, trial seed, stream id) (see
+    ``model.NOISE_STREAM``): the noise of a cell depends only on its key,
+    not on the other cells, the order they are created in, the thread
+    count or the number of MPI ranks.
+    """
+    stream = 1  # third Random123 key; other random inputs of a cell would use other ids
+
+    def __init__(self, seg, gid, std=0.3, dur=1e9, delay=0, seed=0):
+        """
+        :param seg: Segment the noise source is placed in.
+        :param gid: Gid of the cell (or another per-cell index), first key of the stream.
+        :param std: Standard deviation of the noise current (nA).
+        :param dur: Duration of the noise (ms).
+        :param delay: Onset of the noise (ms).
+        :param seed: Seed of the first run.
+        """
+        self.gid = gid
+        self._inoise = h.INoise(seg)
+        setattr(self._inoise, 'del', delay)   # RANGE del, which NEURON also exposes as .delay
+        self._inoise.dur = dur
+        self._inoise.std = std
+        self._rng = h.Random()
+        self._inoise.noiseFromRandom(self._rng)
+        self.seed(seed)
+
+    @property
+    def std(self):
+        return self._inoise.std
+
+    @std.setter
+    def std(self, std):
+        self._inoise.std = std
+
+    def seed(self, seed):
+        """Restart the stream of this cell at the beginning of trial ``seed`` (a 32-bit integer)."""
+        self._rng.Random123(self.gid, int(seed), self.stream)
+        self._rng.normal(0, 1)
+
+
+class BufferedNoise:
+    """INoise background current read from values drawn before the run.
+
+    Delivers the same white noise as NoiseCurrent, a new normal value of
+    standard deviation ``std`` on every time step, but the whole run is
+    drawn at once with NumPy's Philox (a counter based generator of the
+    Random123 family, keyed by (gid, trial seed, stream id) like
+    NoiseCurrent) into a Vector the mechanism reads with
+    ``noiseFromBuffer``, so no random numbers are drawn while integrating.
+    The values are only redrawn when the seed changes, and runs with the
+    same seed share one noise realization.
+    """
+    stream = NoiseCurrent.stream
+
+    def __init__(self, seg, gid, std=0.3, dur=100, delay=0, seed=0, dt=0.1):
+        """
+        :param seg: Segment the noise source is placed in.
+        :param gid: Gid of the cell (or another per-cell index), first key of the stream.
+        :param std: Standard deviation of the noise current (nA).
+        :param dur: Duration of the noise (ms).
+        :param delay: Onset of the noise (ms).
+        :param seed: Seed of the first run.
+        :param dt: Integration time step (ms); one value is drawn per step.
+        """
+        self.gid = gid
+        self._n_steps = int(round(dur / dt)) + 1   # INoise reads value round((t - del) / dt), 1 to dur / dt
+        self._seed = None
+        self._inoise = h.INoise(seg)
+        setattr(self._inoise, 'del', delay)   # RANGE del, which NEURON also exposes as .delay
+        self._inoise.dur = dur
+        self._inoise.std = std
+        self._buffer = h.Vector(self._n_steps)
+        self._inoise.noiseFromBuffer(self._buffer)
+        self.seed(seed)
+
+    @property
+    def std(self):
+        return self._inoise.std
+
+    @std.setter
+    def std(self, std):
+        self._inoise.std = std
+
+    def seed(self, seed):
+        """Draw the values of trial ``seed`` (a 32-bit integer), unless they are already loaded."""
+        if seed == self._seed:
+            return
+        self._seed = int(seed)
+        rng = np.random.Generator(np.random.Philox(key=self._seed << 64 | self.gid << 32 | self.stream))
+        self._buffer.from_python(rng.standard_normal(self._n_steps))
+
+
+INPUT_TYPES = {'current': PulseCurrent, 'synapse': PulseSynapse}
+NOISE_TYPES = {'inoise': NoiseCurrent, 'buffer': BufferedNoise}
@@ -0,0 +1,80 @@
+import fcntl
+import json
+import os
+
+import numpy as np
+
+from .cache import params_hash, stim_params
+
+
+class SweepJournal:
+    """Append-only record of finished sweep batches, one JSON line each.
+
+    Every batch is appended and fsynced as soon as it completes, so a killed
+    sweep resumes from the journal and only re-runs unfinished batches.
+    Unlike the ResultCache nothing is ever evicted. Appends take an
+    exclusive ``flock`` on the file and are single writes, so any number of
+    processes can share one journal; a line torn by a crash is skipped on
+    reading.
+
+    Records of other model parameters stay in the file but are ignored.
+    """
+    def __init__(self, path, model_params):
+        """
+        :param path: Journal file, created on the first append.
+        :param model_params: Parameters that determine a result besides the
+            stimulus, as for ResultCache.
+        """
+        self.path = path
+        self.model_hash = params_hash(json.loads(json.dumps(model_params, default=str)))
+        self._results = None
+        self._offset = 0
+
+    def _read(self):
+        # pick up lines appended since the last read, also by other processes
+        if self._results is None:
+            self._results = {}
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, 'rb') as f:
+            fcntl.flock(f, fcntl.LOCK_SH)
+            try:
+                f.seek(self._offset)
+                data = f.read()
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+        end = data.rfind(b'\n') + 1                     # leave a partial last line for the next read
+        self._offset += end
+        for line in data[:end].splitlines():
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue                                # torn by a crash mid-write
+            if record.get('model') == self.model_hash:
+                self._results[record['stim_hash']] = record['arrays']
+
+    def get(self, a_in, s_in, seed, **extra):
+        """Journaled arrays for this stimulus as a tuple, or None if it was not run yet."""
+        stim_hash = params_hash(stim_params(a_in, s_in, seed, **extra))
+        if self._results is None or stim_hash not in self._results:
+            self._read()
+        arrays = self._results.get(stim_hash)
+        return None if arrays is None else tuple(np.array(a) for a in arrays)
+
+    def put(self, a_in, s_in, seed, *arrays, **extra):
+        """Durably append ``arrays`` for this stimulus."""
+        stim = stim_params(a_in, s_in, seed, **extra)
+        record = {'model': self.model_hash, 'stim_hash': params_hash(stim), 'stim': stim,
+                  'arrays': [np.asarray(a).tolist() for a in arrays]}
+        line = (json.dumps(record) + '\n').encode()
+        fd = os.open(self.path, os.O_RDWR | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            if os.fstat(fd).st_size and os.pread(fd, 1, os.fstat(fd).st_size - 1) != b'\n':
+                line = b'\n' + line                     # terminate a line torn by a crash
+            os.write(fd, line)
+            os.fsync(fd)
+        finally:
+            os.close(fd)                                # also releases the lock
+        if self._results is not None:
+            self._results[record['stim_hash']] = record['arrays']
@@ -0,0 +1,184 @@
+import inspect
+
+import numpy as np
+
+from .model import soma_secs, EXC_SYN, NOISE_STREAM, pulse_packet_times
+from .single_cell import SingleCellExperiment
+from .sweep import SweepPool, sweep_tasks, run_tasks
+
+
+class LayerExperiment(SingleCellExperiment):
+    """One synfire layer driven by a pulse packet from the previous layer.
+
+    Every presynaptic spike of the packet reaches each of the
+    ``layer_size`` cells independently with the connection probability, as
+    with the random layer-to-layer connections of the fig3 chains, and is
+    played through that cell's VecStim into an Exp2Syn. A run simulates
+    ``n_trials`` independent layers side by side.
+    """
+    def __init__(self, layer_size=100, probability=0.1, weight=0.001, noise_std=0.3, noise='inoise', t_mean=20, window=(10, 45), duration=50,
+                 dt=0.1, n_trials=1, early_stop=True, save=False):
+        """
+        :param layer_size: Number of cells in the layer.
+        :param probability: Probability that a presynaptic spike reaches a cell.
+        :param weight: Weight of the synaptic input (uS).
+        :param noise_std: Standard deviation of the background noise current (nA).
+        :param noise: 'inoise' or 'buffer', see SingleCellExperiment.
+        :param t_mean: Center of the input pulse packet (ms).
+        :param window: Analysis window for the output spikes (ms).
+        :param duration: Duration of each trial (ms).
+        :param dt: Integration time step (ms).
+        :param n_trials: Number of independent layers simulated per run.
+        :param early_stop: Stop integrating once the output window is decided.
+        :param save: Record V_soma and write the fig2_result store after every run.
+        """
+        self.layer_size = layer_size
+        self.probability = probability
+        self.n_layers = n_trials
+        super().__init__(noise_std=noise_std, noise=noise, input_type='synapse', input_params={'weight': weight}, t_mean=t_mean, window=window,
+                         duration=duration, dt=dt, n_trials=n_trials * layer_size, early_stop=early_stop, save=save)
+
+    def _packets(self, a_in, s_in, seed):
+        packets = []
+        for k in range(self.n_layers):
+            packet = pulse_packet_times(a_in, s_in, t_mean=self.t_mean, t_stop=self.duration, seed=seed if k == 0 else None)
+            connected = np.random.random_sample((self.layer_size, len(packet))) < self.probability
+            packets.extend(packet[row] for row in connected)
+        return packets
+
+    def run_batch(self, a_in, s_in, seed=None):
+        """Simulate ``n_trials`` independent layers in one run.
+
+        Returns an array of shape ``(n_trials, layer_size)`` with the first
+        output spike time of every cell in the analysis window, 0 where the
+        cell did not fire.
+        """
+        return super().run_batch(a_in, s_in, seed).reshape(self.n_layers, self.layer_size)
+
+
+def layer_response(spike_times):
+    """Reduce the first-spike times of a batch of layers to (a_out, s_out) per layer.
+
+    :param spike_times: Array of shape (layers, cells), 0 where a cell did not fire.
+    """
+    spike_times = np.atleast_2d(spike_times)
+    fired = spike_times != 0
+    a_out = np.count_nonzero(fired, axis=1)
+    s_out = np.zeros(len(spike_times))
+    for k, row in enumerate(spike_times):
+        if a_out[k] > 1:
+            s_out[k] = np.std(row[fired[k]])
+    return a_out, s_out
+
+
+def model_params(experiment_params=None):
+    """Everything besides the stimulus that determines the outcome of a
+    LayerExperiment trial, used to key cached results.
+
+    :param experiment_params: Keyword arguments passed to LayerExperiment.
+    """
+    params = {name: p.default for name, p in inspect.signature(LayerExperiment).parameters.items()
+              if p.default is not inspect.Parameter.empty and name not in ('n_trials', 'early_stop', 'save')}
+    params.update(experiment_params or {})
+    return {'cell': soma_secs(), 'syn': EXC_SYN, 'noise': NOISE_STREAM, 'layer': params}
+
+
+def _nearest(grid, x):
+    # index of the grid point nearest to each value of x
+    return np.abs(np.subtract.outer(np.asarray(x, dtype=float), np.asarray(grid, dtype=float))).argmin(axis=-1)
+
+
+class TransferKernel:
+    """Discretized Markov kernel P(a_out, s_out | a_in, s_in) of one layer.
+
+    States are the points of the (a, s) grid; every simulated outcome is
+    assigned to the nearest grid point, a layer with fewer than two spikes
+    to s = 0. Propagating a packet through n layers is then n products with
+    the transition matrix instead of a chain simulation. The packets fed to
+    each layer are Gaussian, so the kernel assumes the output of a layer is
+    described by its spike count and spread alone.
+    """
+    def __init__(self, a_values, s_values, counts):
+        """
+        :param a_values: Grid of spike counts.
+        :param s_values: Grid of packet spreads (ms).
+        :param counts: Outcome counts of shape (len(a), len(s), len(a), len(s)),
+            indexed by (a_in, s_in, a_out, s_out).
+        """
+        self.a_values = np.asarray(a_values)
+        self.s_values = np.asarray(s_values, dtype=float)
+        self.counts = np.asarray(counts)
+        n_states = len(self.a_values) * len(self.s_values)
+        flat = self.counts.reshape(n_states, n_states).astype(float)
+        self.matrix = flat / np.maximum(flat.sum(axis=1, keepdims=True), 1)  # row-stochastic, row = input state
+
+    @property
+    def shape(self):
+        return len(self.a_values), len(self.s_values)
+
+    def bins(self, a, s):
+        """Grid indices of the points nearest to (a, s)."""
+        return _nearest(self.a_values, a), _nearest(self.s_values, s)
+
+    def point(self, a, s):
+        """Distribution concentrated on the grid point nearest to (a, s)."""
+        p = np.zeros(self.shape)
+        p[self.bins(a, s)] = 1
+        return p
+
+    def propagate(self, p, n_layers):
+        """Distributions over (a, s) after 0..n_layers layers, shape (n_layers + 1, len(a), len(s))."""
+        dists = [np.asarray(p, dtype=float).ravel()]
+        for _ in range(n_layers):
+            dists.append(dists[-1] @ self.matrix)
+        return np.array(dists).reshape(-1, *self.shape)
+
+    def sample(self, a, s, n_layers, n_samples=1, seed=None):
+        """Random trajectories through the chain starting at (a, s).
+
+        Returns ``(a, s)`` arrays of shape ``(n_samples, n_layers + 1)``.
+        """
+        rng = np.random.default_rng(seed)
+        cumulative = np.cumsum(self.matrix, axis=1)
+        i, j = self.bins(a, s)
+        states = np.full(n_samples, np.ravel_multi_index((i, j), self.shape))
+        path = [states]
+        for _ in range(n_layers):
+            u = rng.random(n_samples) * cumulative[states, -1]
+            states = np.minimum((cumulative[states] <= u[:, None]).sum(axis=1), cumulative.shape[1] - 1)
+            path.append(states)
+        i, j = np.unravel_index(np.array(path).T, self.shape)
+        return self.a_values[i], self.s_values[j]
+
+    def survival(self, n_layers, a_min=50):
+        """Probability that a packet starting at each grid point still has at
+        least ``a_min`` spikes after ``n_layers`` layers, shape (len(a), len(s)).
+
+        Its 0.5 contour is the separatrix between extinction and stable propagation.
+        """
+        reach = np.linalg.matrix_power(self.matrix, n_layers)
+        alive = np.repeat(self.a_values >= a_min, len(self.s_values))
+        return reach[:, alive].sum(axis=1).reshape(self.shape)
+
+
+def estimate_kernel(a_values, s_values, n_trials=100, trials_per_task=20, root_seed=0, processes=None, experiment_params=None,
+                    cache=None, journal=None):
+    """Estimate the layer kernel from ``n_trials`` LayerExperiment trials at
+    every (a_in, s_in) grid point.
+
+    The trials run as batches on a SweepPool with the same seeding as
+    ``run_sweep``, so the kernel is reproducible and cached batches are reused.
+
+    :param experiment_params: Keyword arguments for LayerExperiment.
+    :param cache: ResultCache built for ``model_params(experiment_params)``.
+    :param journal: SweepJournal to resume from and append finished batches to.
+    """
+    tasks = sweep_tasks(a_values, s_values, n_trials, trials_per_task, root_seed)
+    with SweepPool(processes, experiment_params, trials_per_task, LayerExperiment) as pool:
+        results = run_tasks(tasks, pool, cache, journal)
+
+    counts = np.zeros((len(a_values), len(s_values)) * 2, dtype=int)
+    for (i, j, _), spike_times in results.items():
+        a_out, s_out = layer_response(spike_times)
+        np.add.at(counts[i, j], (_nearest(a_values, a_out), _nearest(s_values, s_out)), 1)
+    return TransferKernel(a_values, s_values, counts)
@@ -0,0 +1,81 @@
+import numpy as np
+
+
+def soma_secs():
+    """Sections dict for the single-compartment HH cell used in every figure."""
+    secs = {} # sections dict
+    secs['soma'] = {'geom': {}, 'mechs': {}}                                                # soma params dict
+    secs['soma']['geom'] = {'diam': 15, 'L': 14, 'Ra': 120.0}                               # soma geometry
+    secs['soma']['mechs']['hh'] = {'gnabar': 0.13, 'gkbar': 0.036, 'gl': 0.003, 'el': -70}  # soma hh mechanism
+    return secs
+
+
+EXC_SYN = {'mod': 'Exp2Syn', 'tau1': 0.8, 'tau2': 5.3, 'e': 0}  # NMDA synaptic mechanism
+
+NOISE_STREAM = 'Random123(gid, seed, 1)'  # keys of the per-cell noise streams in inputs.py, part of cache keys
+
+
+def add_chain(netParams, n_layers=10, layer_size=100, probability=0.1, weight=0.001, delay=15, pop='Neuron_{}',
+              n_input=None, y=0, cell_type='E', syn_mech='exc', gid_shift=0):
+    """Add the populations and layer-to-layer conn rules of a synfire chain
+    to ``netParams`` and return the population names, input layer first.
+
+    Layer ``i`` is population ``pop.format(i)`` of ``layer_size`` cells at
+    depth ``y + 100 * i``; every cell of a layer connects to every cell of
+    the next with the given probability.
+
+    :param n_layers: Number of layers including the input layer.
+    :param layer_size: Number of cells per layer.
+    :param probability: Connection probability between consecutive layers.
+    :param weight: Weight of the layer-to-layer synapses (uS).
+    :param delay: Delay of the layer-to-layer synapses (ms).
+    :param pop: Population name with a ``{}`` for the layer index.
+    :param n_input: If given, only the first ``n_input`` cells of the input
+        layer (population ``pop.format(0) + '_in'``) project to layer 1 and
+        the others form population ``pop.format(0)``, as in fig1.
+    :param y: Depth of the input layer (um).
+    :param gid_shift: If not 0, the connections are those of the cells
+        ``gid_shift`` gids lower (see ``connectivity.connect_cells``), so a
+        chain added after an identical one repeats its connections.
+    """
+    pops = []
+    for i in range(n_layers):
+        layer = {'cellType': cell_type, 'yRange': [y + i * 100, y + i * 100 + 1]}
+        if i == 0 and n_input is not None:
+            pops.append(pop.format(i) + '_in')
+            netParams.popParams[pops[-1]] = dict(layer, numCells=n_input)
+            netParams.popParams[pop.format(i)] = dict(layer, numCells=layer_size - n_input)
+        else:
+            pops.append(pop.format(i))
+            netParams.popParams[pops[-1]] = dict(layer, numCells=layer_size)
+
+    for i in range(n_layers - 1):
+        netParams.connParams[f'{pops[i]}->{pops[i + 1]}'] = {
+            'preConds': {'pop': pops[i]}, 'postConds': {'pop': pops[i + 1]},
+            'probability': probability,
+            'weight': weight,
+            'delay': delay,
+            'synMech': syn_mech}
+        if gid_shift:
+            netParams.connParams[f'{pops[i]}->{pops[i + 1]}']['gidShift'] = gid_shift
+    return pops
+
+
+def generate_pulse_packet(n_spikes, t_mean, t_stdvar, seed=None):
+    if seed is not None:
+        np.random.seed(seed)
+    return np.random.normal(t_mean, t_stdvar, n_spikes)
+
+
+def pulse_packet_times(a_in, s_in, t_mean=20, t_stop=100, seed=None):
+    """Sorted spike times of a pulse packet, rounded to 0.1 ms and clipped to [0, t_stop].
+
+    :param a_in: Number of spikes in the packet.
+    :param s_in: Temporal spread (std) of the packet, in ms.
+    :param t_mean: Center of the packet, in ms.
+    :param t_stop: Spikes after this time are dropped.
+    :param seed: Seed for the global numpy generator, or None to continue the stream.
+    """
+    times = generate_pulse_packet(n_spikes=a_in, t_mean=t_mean, t_stdvar=s_in, seed=seed)
+    times = np.sort(np.round(times, 1))
+    return times[(times >= 0) & (times <= t_stop)]
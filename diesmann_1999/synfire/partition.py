@@ -0,0 +1,140 @@
+import contextlib
+from numbers import Number
+
+import numpy as np
+from netpyne import sim
+
+
+SYN_COST = 0.25  # compute of one synapse relative to one cell (HH soma and noise), both integrated every step
+
+
+def pop_layout(netParams):
+    """Number of cells of every population of ``netParams`` in gid order,
+    and the expected number of connections a cell of each receives from
+    the fixed-probability conn rules between whole populations."""
+    sizes = {label: int(netParams.scale * pop['numCells']) for label, pop in netParams.popParams.items()}
+    in_degrees = dict.fromkeys(sizes, 0.0)
+    for rule in netParams.connParams.values():
+        pre, post = rule.get('preConds', {}).get('pop'), rule.get('postConds', {}).get('pop')
+        if pre in sizes and post in sizes and isinstance(rule.get('probability'), Number):
+            in_degrees[post] += rule['probability'] * sizes[pre]
+    return list(sizes.values()), list(in_degrees.values())
+
+
+def cell_cost(sizes, in_degrees, syn_cost=SYN_COST):
+    """Expected compute of every cell, ``1 + syn_cost * in_degree``, in gid order."""
+    return np.repeat(1 + syn_cost * np.asarray(in_degrees, dtype=float), sizes)
+
+
+def round_robin(sizes, in_degrees, n_ranks):
+    """Rank of every gid as NetPyNE distributes them: gid ``g`` on rank ``g % n_ranks``."""
+    return np.arange(sum(sizes)) % n_ranks
+
+
+def layer_partition(sizes, in_degrees, n_ranks, syn_cost=SYN_COST, tolerance=0.05):
+    """Rank of every gid, with the populations in contiguous blocks of equal cost.
+
+    The gids, layer after layer, are cut into ``n_ranks`` blocks of equal
+    total ``cell_cost``, and each cut is moved to the nearest population
+    boundary if that moves it by at most ``tolerance`` of a rank's share.
+    In a feed-forward chain only the connections across a cut leave their
+    rank, about one layer's worth per rank, where round-robin sends all but
+    ``1 / n_ranks`` of them to other ranks.
+    """
+    cum = np.concatenate(([0], np.cumsum(cell_cost(sizes, in_degrees, syn_cost))))
+    share = cum[-1] / n_ranks
+    bounds = np.cumsum([0] + list(sizes))
+    cuts = [0]
+    for k in range(1, n_ranks):
+        cut = bounds[np.argmin(np.abs(cum[bounds] - k * share))]
+        if abs(cum[cut] - k * share) > tolerance * share:
+            cut = np.argmin(np.abs(cum - k * share))    # split the population
+        cuts.append(max(int(cut), cuts[-1]))
+    cuts.append(len(cum) - 1)
+    return np.repeat(np.arange(n_ranks), np.diff(cuts))
+
+
+PARTITIONS = {'round_robin': round_robin, 'layers': layer_partition}
+
+
+@contextlib.contextmanager
+def distribute_cells(ranks):
+    """Create gid ``g`` on rank ``ranks[g]`` instead of round-robin within
+    the ``with`` block, which wraps ``sim.net.createCells``.
+
+    This replaces ``Pop._distributeCells``, private to NetPyNE (present in
+    1.1), and restores it on leaving the block; a NetPyNE without it keeps
+    round-robin, which changes only the run time.
+    """
+    def distribute(numCells):
+        block = np.asarray(ranks[sim.net.lastGid:sim.net.lastGid + numCells])
+        return {rank: np.flatnonzero(block == rank).tolist() for rank in range(sim.nhosts)}
+
+    pops = [pop for pop in sim.net.pops.values() if hasattr(pop, '_distributeCells')]
+    for pop in pops:
+        pop._distributeCells = distribute
+    try:
+        yield
+    finally:
+        for pop in pops:
+            del pop._distributeCells          # NetPyNE's method again
+
+
+def set_comm_interval():
+    """Exchange spikes every minimum connection delay, the longest interval
+    that still delivers every spike in time (5 ms in fig1, 15 ms in fig3),
+    and return it (ms). Call once all connections are made.
+    """
+    delays = [conn['delay'] for cell in sim.net.cells for conn in cell.conns]
+    min_delay = sim.pc.allreduce(min(delays, default=1e9), 3)
+    return sim.pc.set_maxstep(min_delay)
+
+
+def exchange_report(ranks, pre, post, spkid=None, cost=None):
+    """Spike-exchange volume of a partition, one value per rank.
+
+    Returns a dict of arrays: 'cells' and 'cost' (summed ``cost`` per cell,
+    if given) on each rank, 'conns_out' (connections from its cells to cells
+    on other ranks), 'sources' (its cells with a target on another rank)
+    and, if the spike gids ``spkid`` of a run are given, 'spikes_out' (the
+    spikes of those sources, which other ranks need).
+
+    :param ranks: Rank of every gid.
+    :param pre: Presynaptic gid of every connection.
+    :param post: Postsynaptic gid of every connection.
+    """
+    ranks = np.asarray(ranks)
+    n_ranks = ranks.max() + 1
+    pre, post = np.asarray(pre, dtype=int), np.asarray(post, dtype=int)
+    cross = ranks[pre] != ranks[post]
+    exported = np.zeros(len(ranks), dtype=bool)
+    exported[pre[cross]] = True
+    report = {'cells': np.bincount(ranks, minlength=n_ranks),
+              'conns_out': np.bincount(ranks[pre[cross]], minlength=n_ranks),
+              'sources': np.bincount(ranks[exported], minlength=n_ranks)}
+    if cost is not None:
+        report['cost'] = np.bincount(ranks, weights=cost, minlength=n_ranks)
+    if spkid is not None:
+        spkid = np.asarray(spkid, dtype=int)
+        report['spikes_out'] = np.bincount(ranks[spkid[exported[spkid]]], minlength=n_ranks)
+    return report
+
+
+def network_exchange(spkid=None):
+    """``exchange_report`` of the network in ``sim``, gathered from all ranks."""
+    local = ([cell.gid for cell in sim.net.cells],
+             [(conn['preGid'], cell.gid) for cell in sim.net.cells for conn in cell.conns])
+    parts = sim.pc.py_allgather(local) if sim.nhosts > 1 else [local]
+    ranks = np.zeros(sum(len(gids) for gids, _ in parts), dtype=int)
+    for rank, (gids, _) in enumerate(parts):
+        ranks[gids] = rank
+    conns = np.array([conn for _, rank_conns in parts for conn in rank_conns], dtype=int).reshape(-1, 2)
+    return exchange_report(ranks, conns[:, 0], conns[:, 1], spkid)
+
+
+def print_exchange(report):
+    """Print an ``exchange_report`` as a table, one row per rank."""
+    columns = [name for name in ('cells', 'cost', 'conns_out', 'sources', 'spikes_out') if name in report]
+    print(f'{"rank":>4} ' + ' '.join(f'{name:>10}' for name in columns))
+    for rank in range(len(report['cells'])):
+        print(f'{rank:>4} ' + ' '.join(f'{report[name][rank]:>10.0f}' for name in columns))
@@ -0,0 +1,324 @@
+import os
+
+from netpyne import sim
+import numpy as np
+from neuron import h
+
+from .connectivity import ConnectivityCache, connect_cells
+from .partition import PARTITIONS, distribute_cells, network_exchange, pop_layout, print_exchange, set_comm_interval
+from .store import save_result
+
+
+def gathered_spikes():
+    """Spike times and gids of the last run from all ranks as arrays sorted
+    by time and then gid, so their order does not depend on the number of
+    threads or ranks. Traces and cell data are not gathered and nothing
+    touches disk.
+    """
+    spkt = sim.simData['spkt'].as_numpy().copy()
+    spkid = sim.simData['spkid'].as_numpy().astype(int)
+    if sim.nhosts > 1:
+        parts = sim.pc.py_allgather((spkt, spkid))
+        spkt = np.concatenate([part[0] for part in parts])
+        spkid = np.concatenate([part[1] for part in parts])
+    order = np.lexsort((spkid, spkt))
+    return spkt[order], spkid[order]
+
+
+def save_outputs(plot=False):
+    """Gather the last run to the master node, write the configured output
+    files plus a ``<filename>_result`` store (see ``store.save_result``) and
+    optionally draw the configured plots.
+    """
+    sim.gatherData()                      # gather spiking data and cell info from each node
+    sim.saveData()                        # save params, cell info and sim output to file (pickle,mat,txt,etc)
+    if sim.rank == 0:
+        save_result(sim.cfg.filename + '_result', sim.allSimData)
+    if plot:
+        sim.analysis.plotData()           # plot spike raster
+
+
+def fixed_time_vector():
+    """Fill the recorded time vector with its sample times instead of recording ``h.t``.
+
+    NetPyNE records ``h.t`` through a pointer that NEURON cannot assign to a
+    thread, so a run with ``pc.nthread`` > 1 fails. With a fixed
+    ``recordStep`` the sample times are known in advance, as NetPyNE itself
+    does for ``use_local_dt``.
+    """
+    if 't' in sim.simData:
+        sim.simData['t'].play_remove()
+        sim.simData['t'].indgen(0, sim.cfg.duration, sim.cfg.recordStep)
+
+
+TRACE_KEYS = {'sec', 'loc', 'var', 'mech', 'conds'}  # recordTraces entries record_every_step can re-create
+
+
+def _trace_ref(cell, params):
+    # pointer to a trace in recordTraces format, and the section it is in
+    seg = cell.secs[params['sec']]['hObj'](params.get('loc', 0.5))
+    source = getattr(seg, params['mech']) if 'mech' in params else seg
+    return getattr(source, '_ref_' + params['var']), seg.sec
+
+
+def _record_stride():
+    # time steps per recordStep
+    stride = int(round(sim.cfg.recordStep / sim.cfg.dt))
+    if abs(stride * sim.cfg.dt - sim.cfg.recordStep) > 1e-9:
+        raise ValueError(f'recordStep {sim.cfg.recordStep} is not a multiple of dt {sim.cfg.dt}')
+    return stride
+
+
+def _step_traces():
+    # names of the recordTraces that record_every_step records
+    return [name for name, params in sim.cfg.recordTraces.items() if not set(params) - TRACE_KEYS]
+
+
+def record_every_step():
+    """Record NetPyNE's traces on every time step instead of every ``recordStep``.
+
+    NetPyNE samples the traces every ``recordStep`` with events of thread 0,
+    but in ``pc.psolve`` every thread integrates a whole exchange interval on
+    its own, so with ``pc.nthread`` > 1 the traces of cells on the other
+    threads are sampled at the wrong times and come out stale. A vector
+    recorded on every step is filled by the thread of its section.
+    ``thin_traces`` keeps every ``recordStep`` of them after a run, giving
+    the same samples for any number of threads. Only traces of a segment
+    variable ('sec', 'loc', 'var' and optionally 'mech') are recorded so;
+    ``set_threads`` refuses threads if there are others.
+    """
+    for name in _step_traces():
+        for key, vec in sim.simData.get(name, {}).items():
+            ref, sec = _trace_ref(sim.net.cells[sim.net.gid2lid[int(key[5:])]], sim.cfg.recordTraces[name])
+            vec.record(ref, sec=sec)          # replaces NetPyNE's recording
+
+
+def thin_traces():
+    """Keep every ``recordStep`` of the traces of ``record_every_step``; call after every run."""
+    stride = _record_stride()
+    for name in _step_traces():
+        for vec in sim.simData.get(name, {}).values():
+            vec.from_python(vec.as_numpy()[::stride].copy())
+
+
+def set_threads(n_threads):
+    """Distribute the cells over ``n_threads`` threads for the following runs.
+
+    Raises ValueError for more than one thread if a trace is recorded that
+    ``record_every_step`` cannot record, as it would come out stale.
+    """
+    others = sorted(set(sim.cfg.recordTraces) - set(_step_traces()))
+    if n_threads > 1 and others:
+        raise ValueError(f'traces {others} can only be recorded with one thread')
+    fixed_time_vector()                   # h.t cannot be recorded with threads
+    sim.pc.nthread(n_threads)
+
+
+def create_network(netParams, simConfig, conn_cache=None, partition=None):
+    """``sim.create``, with the fixed-probability conn rules generated in
+    NumPy (see ``connectivity.connect_cells``) and the connections taken
+    from ``conn_cache`` (a ``connectivity.ConnectivityCache``) if this
+    network is stored there.
+
+    The cells are split over the ranks by ``partition``, a name in
+    ``partition.PARTITIONS`` ('layers' keeps a chain's layers together), or
+    round-robin by NetPyNE if None. Neither changes the spikes or traces,
+    which are recorded on every step (see ``record_every_step``).
+    """
+    sim.initialize(netParams, simConfig)  # the steps of sim.create, with connectCells replaced
+    sim.net.createPops()
+    if partition is None:
+        sim.net.createCells()
+    else:
+        with distribute_cells(PARTITIONS[partition](*pop_layout(netParams), sim.nhosts)):
+            sim.net.createCells()
+    if conn_cache is None:
+        connect_cells()
+    else:
+        conn_cache.connect()
+    sim.net.addStims()
+    sim.net.addRxD()
+    sim.setupRecording()
+    record_every_step()
+
+
+def pre_run():
+    """``sim.preRun``, with spikes exchanged every minimum connection delay
+    (see ``partition.set_comm_interval``) instead of NetPyNE's 10 ms.
+
+    Run with ``sim.runSim(skipPreRun=True)`` or ``pc.psolve`` afterwards,
+    as every other NetPyNE run calls ``preRun`` again.
+    """
+    sim.preRun()
+    interval = set_comm_interval()
+    if sim.rank == 0 and sim.cfg.verbose:
+        print(f'  Exchanging spikes every {interval} ms')
+
+
+class TraceStream:
+    """Traces written to a result store in chunks while the simulation runs.
+
+    NetPyNE keeps every recorded sample in memory until the run ends, so
+    memory grows with cells x duration / recordStep. A TraceStream records
+    the traces itself, on every step like ``record_every_step``, and every
+    ``interval`` ms of simulated time (by default ``cfg.saveFileStep``, the
+    step NetPyNE saves partial results at) copies the samples that fall on
+    a ``recordStep`` into a time-major ``.npy`` file per trace and rank,
+    mapped only for that copy, then empties its vectors. Memory stays
+    bounded by one interval whatever the duration; ``save`` completes the
+    store so ``store.open_result`` reads the traces like any other.
+    """
+    def __init__(self, path, traces=None, interval=None, dtype='float64'):
+        """
+        :param path: Store directory, completed by ``save``.
+        :param traces: Traces in ``recordTraces`` format ('sec', 'loc', 'var'
+            and optionally 'mech'), recorded from the cells NetPyNE records:
+            ``cfg.recordCells`` and those the ``plotTraces`` analysis
+            includes. Defaults to ``sim.cfg.recordTraces``; NetPyNE stops
+            recording these itself, but has already allocated its vectors
+            for the whole run, so leave them out of the config to save that too.
+        :param interval: Simulated time between flushes (ms).
+        :param dtype: Sample type on disk, e.g. 'float32' for half the size.
+        """
+        self.path = path
+        self.traces = dict(sim.cfg.recordTraces if traces is None else traces)
+        self.interval = interval or getattr(sim.cfg, 'saveFileStep', None) or 100
+        self.dtype = np.dtype(dtype)
+        self._stride = _record_stride()
+        self._n_samples = int(round(sim.cfg.duration / sim.cfg.recordStep)) + 1
+        os.makedirs(path, exist_ok=True)
+
+        cells = sim.getCellsList(sim.cfg.recordCells)
+        if 'include' in sim.cfg.analysis.get('plotTraces', {}):
+            cells += sim.getCellsList(sim.cfg.analysis['plotTraces']['include'])
+        cells = sorted({cell.gid: cell for cell in cells}.values(), key=lambda cell: cell.gid)
+        self.gids = [cell.gid for cell in cells]
+        self._vecs = {}
+        self._files = {}
+        for name, params in self.traces.items():
+            for vec in sim.simData.pop(name, {}).values():   # drop NetPyNE's in-memory copy
+                if hasattr(vec, 'play_remove'):
+                    vec.play_remove()
+            self._vecs[name] = []
+            for cell in cells:
+                ref, sec = _trace_ref(cell, params)
+                vec = h.Vector()
+                vec.record(ref, sec=sec)
+                self._vecs[name].append(vec)
+            self._files[name] = f'{name}.rank{sim.rank}.npy'
+            np.lib.format.open_memmap(os.path.join(path, self._files[name]), mode='w+', dtype=self.dtype,
+                                      shape=(self._n_samples, len(cells)))
+        self._steps = 0                       # samples recorded so far, one per step
+        self._written = 0                     # samples written, one per recordStep
+
+    def flush(self, t=None):
+        """Append the samples recorded since the last flush that fall on a ``recordStep`` to the files."""
+        n_steps = int(round(h.t / sim.cfg.dt)) + 1 - self._steps   # also on ranks without recorded cells
+        keep = np.arange(-self._steps % self._stride, n_steps, self._stride)
+        n = min(len(keep), self._n_samples - self._written)
+        for name, vecs in self._vecs.items():
+            out = np.load(os.path.join(self.path, self._files[name]), mmap_mode='r+')
+            chunk = out[self._written:self._written + n]
+            for j, vec in enumerate(vecs):
+                chunk[:, j] = vec.as_numpy()[keep[:n]]
+                vec.resize(0)
+            out.flush()
+            del chunk, out                    # unmap, so written pages do not stay resident
+        self._steps += n_steps
+        self._written += n
+
+    def run(self):
+        """Run the simulation like ``sim.runSim``, flushing every ``interval`` ms."""
+        pre_run()
+        sim.pc.barrier()
+        sim.timing('start', 'runTime')
+        h.finitialize(float(sim.cfg.hParams['v_init']))
+        while h.t < sim.cfg.duration - sim.cfg.dt / 2:   # psolve may stop just short of the target
+            sim.pc.psolve(min(sim.cfg.duration, h.t + self.interval))
+            self.flush()
+        sim.pc.barrier()
+        sim.timing('stop', 'runTime')
+
+    def entries(self):
+        """Manifest entries of the streamed traces for ``store.save_result``, from all ranks."""
+        parts = {name: {'file': file, 'gids': self.gids} for name, file in self._files.items()}
+        all_parts = sim.pc.py_allgather(parts) if sim.nhosts > 1 else [parts]
+        return {name: {'gids': sorted(gid for rank in all_parts for gid in rank[name]['gids']),
+                       'parts': [rank[name] for rank in all_parts], 'dtype': str(self.dtype)}
+                for name in self._files}
+
+    def save(self, sim_data=None, meta=None):
+        """Complete the store with ``sim_data`` (``sim.allSimData`` by default) and the streamed traces."""
+        entries = self.entries()
+        if sim.rank == 0:
+            sim_data = dict(sim.allSimData if sim_data is None else sim_data)
+            sim_data.setdefault('t', np.arange(self._written) * sim.cfg.recordStep)  # not recorded without NetPyNE traces
+            save_result(self.path, sim_data, meta, cells=entries)
+
+
+def create_simulate_analyze(netParams, simConfig, cell_hooks=(), n_threads=1, stream_traces=None, conn_cache=None,
+                            partition=None):
+    """``sim.createSimulateAnalyze`` with a stage for custom per-cell objects
+    between building the network and running it.
+
+    Every hook is called with each cell of this rank once the network is
+    created, so point processes NetPyNE cannot describe (such as a
+    NoiseCurrent per cell) are in place for the only run; the network is
+    then simulated, gathered, saved and plotted once. The output is also
+    written as a ``<filename>_result`` store (see ``store.save_result``).
+
+    :param cell_hooks: Functions ``hook(cell)``; their return values are
+        kept and returned, one list per hook, so the objects stay alive.
+    :param n_threads: Number of threads the run is distributed over.
+    :param stream_traces: Keyword arguments for a TraceStream (e.g.
+        ``{'dtype': 'float32'}``) to write the recorded traces to the store
+        during the run instead of keeping them in memory. NetPyNE's trace
+        plots need them in memory and are skipped.
+    :param conn_cache: ConnectivityCache to load the connections from or store them in.
+    :param partition: How the cells are split over MPI ranks, see ``create_network``.
+    """
+    if stream_traces is not None:
+        # taken from NetPyNE before sim.create, which would allocate them for the whole run
+        traces, simConfig.recordTraces = simConfig.recordTraces, {}
+    create_network(netParams, simConfig, conn_cache, partition)
+    objects = [[hook(cell) for cell in sim.net.cells] for hook in cell_hooks]
+    set_threads(n_threads)
+    if stream_traces is None:
+        pre_run()
+        sim.runSim(skipPreRun=True)
+        thin_traces()
+        sim.gatherData()                  # gather spikes and traces from each node
+        sim.analyze()                     # save output files and draw the configured plots
+        if sim.rank == 0:
+            save_result(sim.cfg.filename + '_result', sim.allSimData)
+    else:
+        stream = TraceStream(sim.cfg.filename + '_result', traces=traces, **stream_traces)
+        sim.cfg.analysis.pop('plotTraces', None)
+        stream.run()
+        sim.gatherData()
+        sim.analyze()
+        stream.save()
+    return objects
+
+
+def run_figure(netParams, simConfig, cell_hooks=(), n_threads=1, partition='layers', stream_traces=None,
+               conn_cache='conn_cache'):
+    """``create_simulate_analyze`` with the run settings of the fig1 scripts.
+
+    Under mpiexec the spike exchange of every rank (see
+    ``partition.network_exchange``) is printed after the run.
+
+    :param conn_cache: Directory of the ConnectivityCache the connections
+        are drawn into once per network and seed and then loaded from, or
+        None to draw them on every run.
+
+    The other parameters are those of ``create_simulate_analyze``.
+    """
+    if conn_cache is not None:
+        conn_cache = ConnectivityCache(conn_cache)
+    objects = create_simulate_analyze(netParams, simConfig, cell_hooks, n_threads, stream_traces, conn_cache, partition)
+    if sim.nhosts > 1:
+        exchange = network_exchange(gathered_spikes()[1])
+        if sim.rank == 0:
+            print_exchange(exchange)
+    return objects
@@ -0,0 +1,185 @@
+import inspect
+
+from netpyne import specs, sim
+import numpy as np
+from neuron import h
+
+from .model import soma_secs, EXC_SYN, NOISE_STREAM, pulse_packet_times
+from .inputs import INPUT_TYPES, NOISE_TYPES
+from .simrun import gathered_spikes, save_outputs
+
+
+def packet_response(spike_times):
+    """Reduce the first-spike times of a batch of trials to (alpha, s_out).
+
+    :param spike_times: First output spike time of each trial, 0 where the
+        cell did not fire in the analysis window.
+    """
+    spike_times = np.asarray(spike_times, dtype=float)
+    fired = spike_times[spike_times != 0]
+    alpha = len(fired) / len(spike_times)
+    s_out = np.std(fired) if len(fired) else 0
+    return alpha, s_out
+
+
+class SingleCellExperiment:
+    """A noisy HH soma that is built once and re-driven with a new pulse
+    packet on every trial.
+
+    The somata, synapse and noise sources are created with a single
+    ``sim.create``. Each cell gets one input source from ``inputs.py``
+    (summed current pulses, or a VecStim driving a synapse), so a trial only
+    swaps that source's spike times and re-initializes the model instead of
+    rebuilding the network.
+
+    With ``n_trials > 1`` the model holds that many unconnected copies of the
+    soma, each with its own pulse packet and noise source, so one run
+    simulates a whole batch of independent trials.
+
+    Only the first spike inside ``window`` is used, so by default a run stops
+    as soon as every cell has fired in the window or the window has closed.
+    Runs are compute-only unless ``save`` is set: spikes are read from memory
+    and no traces, data files or plots are produced.
+    """
+    stop_check = 1  # interval (ms) at which an early-stopping run checks for spikes
+
+    def __init__(self, noise_std=0.45, noise='inoise', input_type='current', input_params=None, t_mean=20, window=(10, 30), duration=100, dt=0.05,
+                 n_trials=1, early_stop=True, save=False):
+        """
+        :param noise_std: Standard deviation of the background noise current (nA).
+        :param noise: 'inoise' (drawn by INoise on every step) or 'buffer' (drawn
+            for the whole run with NumPy before it starts, see inputs.BufferedNoise).
+        :param input_type: 'current' (one 0.4 nA, 1 ms pulse per input spike) or
+            'synapse' (input spikes played through a VecStim into an Exp2Syn).
+        :param input_params: Keyword arguments for the input source.
+        :param t_mean: Center of the input pulse packet (ms).
+        :param window: Analysis window for the output spike (ms).
+        :param duration: Duration of each trial (ms).
+        :param dt: Integration time step (ms).
+        :param n_trials: Number of independent cells simulated per run.
+        :param early_stop: Stop integrating once the first-spike window is decided;
+            gives the same spike times as running to ``duration``.
+        :param save: Record V_soma and write the fig2_result store after every run.
+        """
+        self.noise_std = noise_std
+        self.noise = noise
+        self.input_type = input_type
+        self.input_params = input_params or {}
+        self.t_mean = t_mean
+        self.window = window
+        self.duration = duration
+        self.dt = dt
+        self.n_trials = n_trials
+        self.early_stop = early_stop
+        self.save = save
+        self._build()
+
+    def _build(self):
+        # Network parameters
+        netParams = specs.NetParams()
+        netParams.cellParams['E'] = {'secs': soma_secs()}
+        netParams.popParams['Neuron'] = {'cellType': 'E', 'numCells': self.n_trials}
+        netParams.synMechParams['exc'] = dict(EXC_SYN)
+
+        # Simulation options
+        simConfig = specs.SimConfig()
+        simConfig.duration = self.duration
+        simConfig.dt = self.dt
+        simConfig.verbose = False
+        simConfig.recordStep = 0.5
+        simConfig.filename = 'fig2'
+        simConfig.savePickle = False
+        if self.save:
+            simConfig.recordTraces = {'V_soma':{'sec':'soma','loc':0.5,'var':'v'}}
+            simConfig.recordCells = ['all']
+
+        sim.create(netParams = netParams, simConfig = simConfig)
+
+        self._inputs = {}
+        self._noises = {}
+        for cell in sim.net.cells:
+            seg = cell.secs['soma']['hObj'](0.5)
+
+            # pulse packet input
+            self._inputs[cell.gid] = INPUT_TYPES[self.input_type](seg, **self.input_params)
+
+            # noise stimulation
+            noise_params = {'dt': self.dt} if self.noise == 'buffer' else {}
+            self._noises[cell.gid] = NOISE_TYPES[self.noise](seg, cell.gid, std=self.noise_std, dur=self.duration, **noise_params)
+
+        sim.preRun()
+
+    def run_batch(self, a_in, s_in, seed=None):
+        """Simulate ``n_trials`` independent trials in one run.
+
+        Returns an array with the first output spike time of each trial in
+        the analysis window, or 0 where that cell did not fire.
+
+        :param seed: Seeds both the pulse packets and the noise streams;
+            None continues the current streams.
+        """
+        packets = self._packets(a_in, s_in, seed)
+        for gid, source in self._inputs.items():
+            source.set_times(packets[gid])
+        if seed is not None:
+            for noise in self._noises.values():
+                noise.seed(seed)
+        sim.simData['spkt'].resize(0)
+        sim.simData['spkid'].resize(0)
+
+        self._run()
+        if self.save:
+            save_outputs()
+
+        spkt, spkid = gathered_spikes()
+        return first_spikes(spkt, spkid, self.n_trials, self.window)
+
+    def _packets(self, a_in, s_in, seed):
+        # input spike times of every cell, indexed by gid
+        return [pulse_packet_times(a_in, s_in, t_mean=self.t_mean, t_stop=self.duration, seed=seed if i == 0 else None)
+                for i in range(self.n_trials)]
+
+    def _run(self):
+        if not self.early_stop:
+            sim.runSim(skipPreRun=True)       # run parallel Neuron simulation
+            return
+
+        h.finitialize(float(sim.cfg.hParams['v_init']))
+        t_stop = min(self.window[1], self.duration)
+        while h.t < t_stop - self.dt / 2:
+            sim.pc.psolve(min(h.t + self.stop_check, t_stop))
+            if h.t >= self.window[0]:
+                spkts = first_spikes(sim.simData['spkt'], sim.simData['spkid'], self.n_trials, self.window)
+                if sim.pc.allreduce(np.count_nonzero(spkts), 1) == self.n_trials:
+                    break
+
+    def run_trial(self, a_in, s_in, seed=None):
+        """Simulate one trial and return the first output spike time in the
+        analysis window, or 0 if there is none.
+        """
+        return float(self.run_batch(a_in, s_in, seed)[0])
+
+
+def first_spikes(spkt, spkid, n_cells, window):
+    """First spike time of each of ``n_cells`` cells inside ``window``, 0 where there is none."""
+    spkt = np.asarray(spkt, dtype=float)
+    spkid = np.asarray(spkid, dtype=int)
+    in_window = (spkt >= window[0]) & (spkt <= window[1])
+    spkt, spkid = spkt[in_window], spkid[in_window]
+    order = np.lexsort((spkt, spkid))
+    gids, first = np.unique(spkid[order], return_index=True)
+    out = np.zeros(n_cells)
+    out[gids] = spkt[order][first]
+    return out
+
+
+def model_params(experiment_params=None):
+    """Everything besides the stimulus that determines the outcome of a
+    SingleCellExperiment trial, used to key cached results.
+
+    :param experiment_params: Keyword arguments passed to SingleCellExperiment.
+    """
+    params = {name: p.default for name, p in inspect.signature(SingleCellExperiment).parameters.items()
+              if p.default is not inspect.Parameter.empty and name not in ('n_trials', 'early_stop', 'save')}
+    params.update(experiment_params or {})
+    return {'cell': soma_secs(), 'syn': EXC_SYN, 'noise': NOISE_STREAM, 'experiment': params}
@@ -0,0 +1,103 @@
+import numpy as np
+
+
+def layer_spikes(spkt, spkid, layer_starts, windows=None):
+    """Split spikes by layer in one pass over the spike table.
+
+    Layers are contiguous gid blocks: layer k holds gids from
+    ``layer_starts[k]`` up to (not including) ``layer_starts[k + 1]``.
+
+    Returns a list with the spike times of every layer, in their original order.
+
+    :param layer_starts: First gid of every layer, ascending.
+    :param windows: Optional (start, stop) per layer; only spikes with
+        start <= t <= stop are kept.
+    """
+    spkt = np.asarray(spkt, dtype=float)
+    spkid = np.asarray(spkid, dtype=int)
+    layer = np.searchsorted(layer_starts, spkid, side='right') - 1
+    keep = layer >= 0
+    if windows is not None:
+        windows = np.asarray(windows, dtype=float)
+        start, stop = windows[layer.clip(0)].T
+        keep &= (spkt >= start) & (spkt <= stop)
+    spkt, layer = spkt[keep], layer[keep]
+
+    order = np.argsort(layer, kind='stable')
+    bounds = np.searchsorted(layer[order], np.arange(1, len(layer_starts)))
+    return np.split(spkt[order], bounds)
+
+
+def largest_packet(spike_times, eps):
+    """Largest pulse packet among 1-D spike times.
+
+    Gives the largest cluster of ``DBSCAN(eps=eps, min_samples=2)``: in one
+    dimension its clusters are the runs of sorted spikes whose gaps are at
+    most ``eps``, and spikes alone in their run are noise. Ties go to the
+    earliest packet, as with DBSCAN's first label.
+
+    Returns ``(times, count, std)`` of the packet, an empty packet with std 0
+    if no two spikes are within ``eps``.
+    """
+    times = np.sort(np.asarray(spike_times, dtype=float))
+    breaks = np.flatnonzero(np.diff(times) > eps) + 1
+    starts = np.concatenate(([0], breaks))
+    stops = np.concatenate((breaks, [len(times)]))
+    k = np.argmax(stops - starts)
+    if stops[k] - starts[k] < 2:
+        return times[:0], 0, 0.0
+    packet = times[starts[k]:stops[k]]
+    return packet, len(packet), np.std(packet)
+
+
+class PacketTracker:
+    """Extracts the pulse packet of every layer while the chain runs.
+
+    A layer is analysed as soon as the simulation passes the end of its
+    window: its spikes (or, with at least ``min_spikes`` of them, its
+    largest packet) become ``packets[k]``. Tracking, and with it the run,
+    ends once a packet has died out or saturated, since the layers after it
+    only repeat that state.
+    """
+    def __init__(self, layer_starts, windows=None, eps=3, min_spikes=0, extinct=None, saturated=None):
+        """
+        :param layer_starts: First gid of every layer, ascending.
+        :param windows: (start, stop) per layer, in layer order; without
+            windows every layer is analysed at the end of the run.
+        :param eps: Largest gap (ms) between spikes of one packet.
+        :param min_spikes: Layers with fewer spikes are taken whole, without clustering.
+        :param extinct: Stop once a packet has at most this many spikes.
+        :param saturated: Stop once a packet has at least this many spikes.
+        """
+        self.layer_starts = np.asarray(layer_starts)
+        if windows is None:
+            windows = [(-np.inf, np.inf)] * len(self.layer_starts)
+        self.windows = np.asarray(windows, dtype=float)
+        self.eps = eps
+        self.min_spikes = min_spikes
+        self.extinct = extinct
+        self.saturated = saturated
+        self.packets = []
+        self.done = False
+
+    @property
+    def next_stop(self):
+        """Time at which the next layer can be analysed."""
+        return np.inf if self.done else self.windows[len(self.packets), 1]
+
+    def update(self, spkt, spkid, t):
+        """Analyse every layer whose window has closed by time ``t``.
+
+        Returns True once nothing is left to track.
+        """
+        layers = None
+        while not self.done and self.next_stop <= t:
+            if layers is None:
+                layers = layer_spikes(spkt, spkid, self.layer_starts, self.windows)
+            times = layers[len(self.packets)]
+            packet = times if len(times) < self.min_spikes else largest_packet(times, self.eps)[0]
+            self.packets.append(packet)
+            self.done = (len(self.packets) == len(self.layer_starts)
+                         or self.extinct is not None and len(packet) <= self.extinct
+                         or self.saturated is not None and len(packet) >= self.saturated)
+        return self.done
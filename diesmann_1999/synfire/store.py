@@ -0,0 +1,219 @@
+import json
+import os
+
+import numpy as np
+
+
+MANIFEST = 'manifest.json'
+
+
+def _row_gid(key):
+    # NetPyNE keys per-cell data as 'cell_<gid>'
+    return int(key[5:]) if key.startswith('cell_') and key[5:].isdigit() else None
+
+
+def _time_range(t, t_start, t_stop, eps=1e-9):
+    # index range of sorted times in [t_start, t_stop); recorded times carry
+    # rounding errors (100 ms may be stored as 99.9999999), hence eps
+    lo = 0 if t_start is None else np.searchsorted(t, t_start - eps, side='left')
+    hi = len(t) if t_stop is None else np.searchsorted(t, t_stop - eps, side='left')
+    return lo, hi
+
+
+def _is_scalar(value):
+    # None (e.g. a statistic NetPyNE did not compute) is kept in the manifest as null
+    return value is None or np.isscalar(value)
+
+
+def _flatten(value, prefix=''):
+    # {'a': {'b': [...]}} -> {'a.b': array}, scalars kept as they are
+    if isinstance(value, dict):
+        flat = {}
+        for key, item in value.items():
+            flat.update(_flatten(item, f'{prefix}{key}.'))
+        return flat
+    return {prefix[:-1]: value if _is_scalar(value) else np.asarray(value)}
+
+
+def _numeric(name, array):
+    # None entries become NaN, so no column needs pickling to be saved or mapped
+    array = np.asarray(array)
+    if array.dtype == object:
+        try:
+            array = np.where(np.equal(array, None), np.nan, array).astype(float)
+        except (TypeError, ValueError):
+            raise ValueError(f'column {name} holds values other than numbers and None') from None
+    return array
+
+
+def _entry_files(entry):
+    # files of a manifest 'cells' entry
+    files = [entry[key] for key in ('matrix', 'values', 'offsets') if key in entry]
+    return files + [part['file'] for part in entry.get('parts', [])]
+
+
+def save_result(path, sim_data, meta=None, cells=None):
+    """Write simulation output as a columnar store that ``open_result`` maps lazily.
+
+    ``path`` becomes a directory with one ``.npy`` file per column and a
+    ``manifest.json`` describing them:
+
+    - spike times and gids, sorted by time;
+    - per-cell data (``{'cell_<gid>': ...}`` such as ``V_soma``) as one
+      (cells, samples) matrix per variable, or as concatenated values plus
+      row offsets where cells differ in length;
+    - any other array as a column, scalars in the manifest.
+
+    The manifest is written last, so a store without one is incomplete.
+    Rewriting a store first removes its columns, except the files of
+    ``cells``. None values are kept as null scalars, or as NaN inside arrays.
+
+    :param sim_data: ``sim.allSimData`` or any dict of the same layout.
+    :param meta: JSON-serializable extras for the manifest (e.g. the model parameters).
+    :param cells: Manifest entries of per-cell data already written to
+        ``path``, such as ``TraceStream.entries()``.
+    """
+    os.makedirs(path, exist_ok=True)
+    if os.path.exists(os.path.join(path, MANIFEST)):
+        os.remove(os.path.join(path, MANIFEST))
+    manifest = {'format': 1, 'meta': meta or {}, 'scalars': {}, 'columns': {}, 'cells': dict(cells or {})}
+    kept = {filename for entry in manifest['cells'].values() for filename in _entry_files(entry)}
+    for filename in os.listdir(path):
+        if filename.endswith('.npy') and filename not in kept:   # columns of an earlier result
+            os.remove(os.path.join(path, filename))
+
+    def write(name, array):
+        np.save(os.path.join(path, name + '.npy'), np.ascontiguousarray(_numeric(name, array)))
+        return name + '.npy'
+
+    sim_data = dict(sim_data)
+    if 'spkt' in sim_data:
+        spkt = np.asarray(sim_data.pop('spkt'), dtype=float)
+        spkid = np.asarray(sim_data.pop('spkid', np.zeros(len(spkt))), dtype=int)
+        order = np.lexsort((spkid, spkt))
+        manifest['columns']['spkt'] = write('spkt', spkt[order])
+        manifest['columns']['spkid'] = write('spkid', spkid[order])
+
+    for name, value in sim_data.items():
+        if _is_scalar(value):
+            manifest['scalars'][name] = value.item() if isinstance(value, np.generic) else value
+        elif isinstance(value, dict) and value and all(_row_gid(key) is not None for key in value):
+            gids = sorted(value, key=_row_gid)
+            rows = [_flatten(value[key]) for key in gids]
+            for var in dict.fromkeys(var for row in rows for var in row):
+                arrays = [np.atleast_1d(row.get(var, [])) for row in rows]
+                entry = {'gids': [_row_gid(key) for key in gids]}
+                if len({len(a) for a in arrays}) == 1:
+                    entry['matrix'] = write(f'{name}.{var}' if var else name, np.stack(arrays))
+                else:
+                    offsets = np.concatenate(([0], np.cumsum([len(a) for a in arrays])))
+                    entry['values'] = write(f'{name}.{var}' if var else name, np.concatenate(arrays))
+                    entry['offsets'] = write(f'{name}.{var}.offsets' if var else f'{name}.offsets', offsets)
+                manifest['cells'][f'{name}.{var}' if var else name] = entry
+        else:
+            for var, array in _flatten(value).items():
+                column = f'{name}.{var}' if var else name
+                if _is_scalar(array):
+                    manifest['scalars'][column] = array.item() if isinstance(array, np.generic) else array
+                else:
+                    manifest['columns'][column] = write(column, array)
+
+    with open(os.path.join(path, MANIFEST), 'w') as f:
+        json.dump(manifest, f, indent=1)
+
+
+class StoredResult:
+    """A result written by ``save_result``, read on demand.
+
+    Opening only parses the manifest; columns are memory-mapped the first
+    time they are used, so reading a few cells or a time range touches only
+    those parts of the files.
+    """
+    def __init__(self, path):
+        """
+        :param path: Store directory written by ``save_result``.
+        """
+        self.path = path
+        with open(os.path.join(path, MANIFEST)) as f:
+            self.manifest = json.load(f)
+        self.meta = self.manifest['meta']
+        self.scalars = self.manifest['scalars']
+        self._arrays = {}
+
+    def _load(self, filename):
+        if filename not in self._arrays:
+            self._arrays[filename] = np.load(os.path.join(self.path, filename), mmap_mode='r')
+        return self._arrays[filename]
+
+    def column(self, name):
+        """Memory-mapped column ``name``, e.g. 'spkt' or 't'."""
+        return self._load(self.manifest['columns'][name])
+
+    def spikes(self, t_start=None, t_stop=None, gids=None):
+        """Spike times and gids in ``[t_start, t_stop)``, optionally only of ``gids``."""
+        spkt = self.column('spkt')
+        lo, hi = _time_range(spkt, t_start, t_stop)
+        spkt, spkid = np.array(spkt[lo:hi]), np.array(self.column('spkid')[lo:hi])
+        if gids is not None:
+            keep = np.isin(spkid, gids)
+            spkt, spkid = spkt[keep], spkid[keep]
+        return spkt, spkid
+
+    def gids(self, name):
+        """Gids that per-cell variable ``name`` was recorded from, in row order."""
+        return self.manifest['cells'][name]['gids']
+
+    def trace(self, name, gids=None, t_start=None, t_stop=None):
+        """Recorded time points and values of per-cell variable ``name``.
+
+        Returns ``(t, values)`` with one row of ``values`` per gid (all
+        recorded cells by default), restricted to ``[t_start, t_stop)``.
+        """
+        entry = self.manifest['cells'][name]
+        t = self.column('t')
+        lo, hi = _time_range(t, t_start, t_stop)
+        if 'parts' in entry:
+            return np.array(t[lo:hi]), self._streamed(entry, gids, lo, hi)
+        rows = slice(None) if gids is None else [entry['gids'].index(gid) for gid in np.atleast_1d(gids)]
+        return np.array(t[lo:hi]), np.array(self._load(entry['matrix'])[rows, lo:hi])
+
+    def _streamed(self, entry, gids, lo, hi):
+        # time-major (samples, cells) files written by TraceStream, one per rank
+        gids = entry['gids'] if gids is None else list(np.atleast_1d(gids))
+        out = None
+        for part in entry['parts']:
+            cols = {gid: j for j, gid in enumerate(part['gids'])}
+            rows = [k for k, gid in enumerate(gids) if gid in cols]
+            if not rows:
+                continue
+            block = self._load(part['file'])[lo:hi, [cols[gids[k]] for k in rows]]
+            if out is None:
+                out = np.empty((len(gids), len(block)), dtype=block.dtype)
+            out[rows] = block.T
+        if out is None:
+            raise KeyError(f'no recorded cells among {gids}')
+        return out
+
+    def cell_values(self, name, gid):
+        """Values of per-cell variable ``name`` for one cell, also where cells differ in length."""
+        entry = self.manifest['cells'][name]
+        if 'parts' in entry:
+            return self._streamed(entry, [gid], 0, None)[0]
+        row = entry['gids'].index(gid)
+        if 'matrix' in entry:
+            return np.array(self._load(entry['matrix'])[row])
+        offsets = self._load(entry['offsets'])
+        return np.array(self._load(entry['values'])[offsets[row]:offsets[row + 1]])
+
+
+def open_result(path):
+    """Open a store written by ``save_result``."""
+    return StoredResult(path)
+
+
+def convert_json(json_path, path):
+    """Convert a NetPyNE ``saveJson`` file into a store at ``path``, with its
+    simConfig kept in the manifest."""
+    with open(json_path) as f:
+        data = json.load(f)
+    save_result(path, data['simData'], meta={'simConfig': data.get('simConfig', {}), 'source': os.path.basename(json_path)})
@@ -0,0 +1,146 @@
+import multiprocessing
+import os
+
+import numpy as np
+
+from .single_cell import SingleCellExperiment, packet_response
+
+# one experiment per worker process, built by _init_worker
+_experiment = None
+
+
+def task_seed(root_seed, a_in, s_in, chunk):
+    """Deterministic 32-bit seed for one batch of trials.
+
+    The seed depends on the grid values rather than their position, so a
+    point gets the same trials whichever grid it is part of (s_in is
+    resolved to 1 us).
+    """
+    key = [root_seed, int(a_in), int(round(s_in * 1000)), chunk]
+    return int(np.random.SeedSequence(key).generate_state(1)[0])
+
+
+def _init_worker(experiment_class, experiment_params, trials_per_task):
+    global _experiment
+    _experiment = experiment_class(n_trials=trials_per_task, **experiment_params)
+
+
+def _run_task(task):
+    i, j, chunk, a_in, s_in, n, seed = task
+    return i, j, chunk, _experiment.run_batch(a_in, s_in, seed)[:n]
+
+
+class SweepPool:
+    """Process pool whose workers each hold one SingleCellExperiment (or
+    another experiment class with the same ``run_batch``).
+
+    The workers are only started when the first batch actually needs to be
+    simulated, so a sweep served entirely from the cache starts no process.
+    """
+    def __init__(self, processes=None, experiment_params=None, trials_per_task=100, experiment_class=SingleCellExperiment):
+        """
+        :param processes: Number of worker processes; defaults to the number of cores.
+        :param experiment_params: Keyword arguments for the experiment class.
+        :param trials_per_task: Number of trials in each worker's model.
+        :param experiment_class: Experiment built in every worker.
+        """
+        self.experiment_class = experiment_class
+        self.processes = processes or os.cpu_count()
+        self.experiment_params = experiment_params or {}
+        self.trials_per_task = trials_per_task
+        self._pool = None
+
+    def imap_unordered(self, func, tasks):
+        if self._pool is None:
+            # spawn: every worker starts from a clean interpreter and loads its own NEURON
+            ctx = multiprocessing.get_context('spawn')
+            self._pool = ctx.Pool(min(self.processes, len(tasks)), initializer=_init_worker,
+                                  initargs=(self.experiment_class, self.experiment_params, self.trials_per_task))
+        return self._pool.imap_unordered(func, tasks)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        if self._pool is not None:
+            self._pool.terminate()
+            self._pool = None
+
+
+def sweep_tasks(a_in_values, s_in_values, n_trials, trials_per_task, root_seed, first_chunk=0):
+    """Split the (a_in, s_in, trial) grid into batches of at most ``trials_per_task`` trials."""
+    tasks = []
+    for i, a_in in enumerate(a_in_values):
+        for j, s_in in enumerate(s_in_values):
+            for chunk, start in enumerate(range(0, n_trials, trials_per_task), first_chunk):
+                n = min(trials_per_task, n_trials - start)
+                tasks.append((i, j, chunk, a_in, float(s_in), n, task_seed(root_seed, a_in, s_in, chunk)))
+    return tasks
+
+
+def run_tasks(tasks, pool, cache=None, journal=None):
+    """Run batches from ``sweep_tasks`` and return ``{(i, j, chunk): spike times}``.
+
+    :param pool: SweepPool the missing batches are simulated on.
+    :param cache: ResultCache built for ``model_params(experiment_params)``;
+        batches found in it are not simulated again.
+    :param journal: SweepJournal built for the same parameters; batches in
+        it are skipped and every finished batch is appended to it.
+    """
+    results = {}
+    todo = []
+    for task in tasks:
+        i, j, chunk, a_in, s_in, n, seed = task
+        for store in (journal, cache):
+            stored = store.get(a_in, s_in, seed, n=n) if store is not None else None
+            if stored is not None:
+                results[i, j, chunk] = stored[0]
+                break
+        else:
+            todo.append(task)
+    if not todo:
+        return results
+
+    tasks_by_key = {(i, j, chunk): (a_in, s_in, n, seed) for i, j, chunk, a_in, s_in, n, seed in todo}
+    for i, j, chunk, spkts in pool.imap_unordered(_run_task, todo):
+        results[i, j, chunk] = spkts
+        a_in, s_in, n, seed = tasks_by_key[i, j, chunk]
+        if journal is not None:
+            journal.put(a_in, s_in, seed, spkts, n=n)
+        if cache is not None:
+            cache.put(a_in, s_in, seed, spkts, n=n)
+    return results
+
+
+def run_sweep(a_in_values, s_in_values, n_trials=100, trials_per_task=100, root_seed=0, processes=None, experiment_params=None, cache=None,
+              journal=None):
+    """Run ``n_trials`` single-cell trials for every (a_in, s_in) pair on a
+    process pool and reduce them to alpha and s_out.
+
+    Every worker builds its own NEURON model once and then runs batches of
+    ``trials_per_task`` trials. Each batch is seeded from ``root_seed`` and
+    its grid values, never from the worker it lands on or the order in
+    which tasks finish.
+
+    Returns ``(alpha, s_out)``, both of shape ``(len(a_in_values), len(s_in_values))``.
+
+    :param experiment_params: Keyword arguments for SingleCellExperiment.
+    :param processes: Number of worker processes; defaults to the number of cores.
+    :param cache: ResultCache built for ``model_params(experiment_params)``;
+        batches found in it are not simulated again.
+    :param journal: SweepJournal to resume from and append finished batches to.
+    """
+    tasks = sweep_tasks(a_in_values, s_in_values, n_trials, trials_per_task, root_seed)
+    with SweepPool(processes, experiment_params, trials_per_task) as pool:
+        results = run_tasks(tasks, pool, cache, journal)
+
+    chunks = {}
+    for (i, j, chunk), spkts in results.items():
+        chunks.setdefault((i, j), {})[chunk] = spkts
+
+    alpha = np.zeros((len(a_in_values), len(s_in_values)))
+    s_out = np.zeros((len(a_in_values), len(s_in_values)))
+    for (i, j), point in chunks.items():
+        spkts = np.concatenate([point[chunk] for chunk in sorted(point)])
+        alpha[i, j], s_out[i, j] = packet_response(spkts)
+    return alpha, s_out
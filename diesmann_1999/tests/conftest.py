@@ -0,0 +1,36 @@
+import os
+import shutil
+import subprocess
+import sys
+
+import pytest
+
+DIESMANN = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, DIESMANN)  # shared synfire package, as the figure scripts add '..'
+
+
+@pytest.fixture(scope='session')
+def mechanisms(tmp_path_factory):
+    """INoise and VecStim compiled once per session and loaded into NEURON."""
+    import neuron
+
+    path = tmp_path_factory.mktemp('mechanisms')
+    for mod in ('fig3/inoise.mod', 'fig2/vecevent.mod'):
+        shutil.copy(os.path.join(DIESMANN, mod), path)
+    subprocess.run(['nrnivmodl'], cwd=path, check=True, capture_output=True)
+    neuron.load_mechanisms(str(path))
+    return path
+
+
+@pytest.fixture
+def net(mechanisms, tmp_path, monkeypatch):
+    """Runs the test in its own directory and clears the NetPyNE network it
+    built, leaving NEURON on one thread again."""
+    from neuron import h
+    from netpyne import sim
+
+    monkeypatch.chdir(tmp_path)
+    yield tmp_path
+    if hasattr(sim, 'net'):               # not cleared by the test already
+        sim.clearAll()
+    h.ParallelContext().nthread(1)
@@ -0,0 +1,28 @@
+"""One run of test_chain's small chain, under mpiexec or alone; used by test_chain.
+
+Run as ``python mpi_chain.py <mechanism dir> <partition or None> <out.npz>``;
+rank 0 writes the spikes and the V_soma trace of every cell to ``out.npz``.
+"""
+import os
+import sys
+
+import numpy as np
+from neuron import h, load_mechanisms
+h.nrnmpi_init()                           # before NetPyNE creates its ParallelContext
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from netpyne import sim
+from synfire.chain import SynfireChain
+from test_chain import CHAIN, STIMULI
+
+mechanisms, partition, out = sys.argv[1:4]
+load_mechanisms(mechanisms)
+chain = SynfireChain(**CHAIN, record_traces=True, partition=None if partition == 'None' else partition)
+spkt, spkid = chain.run(*STIMULI[0])
+traces = sim.pc.py_allgather({int(key[5:]): vec.to_python() for key, vec in sim.simData['V_soma'].items()})
+if sim.rank == 0:
+    traces = {gid: v for rank in traces for gid, v in rank.items()}
+    np.savez(out, spkt=spkt, spkid=spkid, v=np.array([traces[gid] for gid in sorted(traces)]))
+sim.pc.barrier()
+sim.pc.done()
+h.quit()                                  # finalizes MPI
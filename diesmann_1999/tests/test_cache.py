@@ -0,0 +1,66 @@
+import numpy as np
+
+from synfire.cache import ResultCache
+from synfire.journal import SweepJournal
+
+MODEL = {'cell': {'diam': 15}, 'experiment': {'noise_std': 0.45}}
+
+
+def test_cache_reuses_results_of_the_same_model(tmp_path):
+    path = str(tmp_path / 'cache.sqlite')
+    cache = ResultCache(path, MODEL)
+    assert cache.get(20, 1.5, 7, n=100) is None
+    cache.put(20, 1.5, 7, np.array([10.5, 0.0]), np.arange(3), n=100)
+
+    # a later session, with s_in given by a slightly different float
+    spkts, extra = ResultCache(path, MODEL).get(20, 1.5 + 1e-12, 7, n=100)
+    assert np.array_equal(spkts, [10.5, 0.0]) and np.array_equal(extra, np.arange(3))
+    assert ResultCache(path, MODEL).get(20, 1.5, 7, n=20) is None
+
+    changed = ResultCache(path, {'cell': {'diam': 15}, 'experiment': {'noise_std': 0.3}})
+    assert changed.get(20, 1.5, 7, n=100) is None
+    [stale] = changed.invalidation_report()
+    assert stale['entries'] == 1 and stale['changed'] == {'experiment.noise_std': (0.45, 0.3)}
+    changed.purge_stale()
+    assert ResultCache(path, MODEL).get(20, 1.5, 7, n=100) is None
+
+
+def test_cache_evicts_least_recently_used(tmp_path):
+    cache = ResultCache(str(tmp_path / 'cache.sqlite'), MODEL)
+    cache.put(20, 1, 0, np.zeros(100))
+    size = cache._db.execute('SELECT size FROM results').fetchone()[0]
+    cache.max_bytes = 3.5 * size                      # room for three entries
+    for seed in (1, 2):
+        cache.put(20, 1, seed, np.zeros(100))
+    cache.get(20, 1, 0)
+    cache.put(20, 1, 3, np.zeros(100))
+    assert cache.get(20, 1, 1) is None
+    assert all(cache.get(20, 1, seed) is not None for seed in (0, 2, 3))
+
+
+def test_journal_is_shared_and_ignores_other_models(tmp_path):
+    path = str(tmp_path / 'journal.jsonl')
+    writer, reader = SweepJournal(path, MODEL), SweepJournal(path, MODEL)
+    assert reader.get(20, 1, 7, n=20) is None
+    writer.put(20, 1, 7, np.array([11.5, 0.0]), n=20)
+    assert np.array_equal(reader.get(20, 1, 7, n=20)[0], [11.5, 0.0])   # appended after reader's first read
+    assert SweepJournal(path, {'other': 1}).get(20, 1, 7, n=20) is None
+
+
+def test_journal_resumes_after_a_torn_line(tmp_path):
+    path = str(tmp_path / 'journal.jsonl')
+    journal = SweepJournal(path, MODEL)
+    journal.put(20, 1, 7, np.array([11.5]), n=1)
+    journal.put(20, 1, 8, np.array([12.5]), n=1)
+    with open(path, 'rb') as f:
+        data = f.read()
+    with open(path, 'wb') as f:
+        f.write(data[:-20])                          # killed while writing the second record
+
+    resumed = SweepJournal(path, MODEL)
+    assert np.array_equal(resumed.get(20, 1, 7, n=1)[0], [11.5])
+    assert resumed.get(20, 1, 8, n=1) is None
+    resumed.put(20, 1, 8, np.array([12.5]), n=1)
+    again = SweepJournal(path, MODEL)
+    assert np.array_equal(again.get(20, 1, 7, n=1)[0], [11.5])
+    assert np.array_equal(again.get(20, 1, 8, n=1)[0], [12.5])
@@ -0,0 +1,80 @@
+import os
+import shutil
+import subprocess
+import sys
+
+from netpyne import sim
+import numpy as np
+import pytest
+
+from synfire.cache import ResultCache
+from synfire.chain import SynfireChain, ChainRuns
+
+CHAIN = {'n_layers': 4, 'layer_size': 20, 'probability': 0.3, 'weight': 0.002, 'delay': 5, 'stim_amp': 0.4,
+         'input_target': 'cell', 't_mean': 10, 'noise_std': 0.3, 'duration': 50}
+STIMULI = [(20, 1, 7), (15, 3, 8), (10, 0, 9)]
+MPI_CHAIN = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'mpi_chain.py')
+
+
+def test_threads_keep_chain_spikes_and_traces(net):
+    chain = SynfireChain(**CHAIN, record_traces=True)
+    runs = []
+    for n_threads in (1, 2, 3):
+        chain.set_threads(n_threads)
+        spkt, spkid = chain.run(*STIMULI[0])
+        v = np.array([sim.simData['V_soma'][f'cell_{cell.gid}'].to_python() for cell in sim.net.cells])
+        runs.append((spkt, spkid, v))
+    assert len(runs[0][0]) > 0 and runs[0][2].shape == (80, 101)
+    for spkt, spkid, v in runs[1:]:
+        assert np.array_equal(spkt, runs[0][0]) and np.array_equal(spkid, runs[0][1])
+        assert np.array_equal(v, runs[0][2])
+
+
+@pytest.mark.skipif(shutil.which('mpiexec') is None, reason='needs mpiexec')
+def test_ranks_and_partition_keep_chain_spikes_and_traces(mechanisms, tmp_path):
+    # lets Open MPI run as root and with more ranks than cores; other MPIs ignore these
+    env = dict(os.environ, OMPI_ALLOW_RUN_AS_ROOT='1', OMPI_ALLOW_RUN_AS_ROOT_CONFIRM='1',
+               OMPI_MCA_rmaps_base_oversubscribe='1')
+    runs = []
+    for n_ranks, partition in [(1, None), (2, None), (2, 'layers'), (3, 'layers')]:
+        out = tmp_path / f'{n_ranks}_{partition}.npz'
+        command = [sys.executable, MPI_CHAIN, str(mechanisms), str(partition), str(out)]
+        if n_ranks > 1:
+            command = ['mpiexec', '-n', str(n_ranks)] + command
+        subprocess.run(command, check=True, capture_output=True, cwd=tmp_path, env=env)
+        with np.load(out) as run:
+            runs.append({name: run[name] for name in run.files})
+    assert len(runs[0]['spkt']) > 0 and runs[0]['v'].shape == (80, 101)
+    for run in runs[1:]:
+        assert all(np.array_equal(run[name], runs[0][name]) for name in ('spkt', 'spkid', 'v'))
+
+
+def test_batched_chains_match_single_runs(net):
+    chain = SynfireChain(**CHAIN)
+    single = [chain.run(*stim) for stim in STIMULI]
+    sim.clearAll()
+
+    chain = SynfireChain(**CHAIN, n_chains=len(STIMULI))
+    conns = {c: sorted((conn['preGid'] - c * chain.chain_size, cell.gid - c * chain.chain_size)
+                       for cell in sim.net.cells if cell.gid // chain.chain_size == c for conn in cell.conns)
+             for c in range(chain.n_chains)}
+    assert conns[0] and all(conns[c] == conns[0] for c in conns)
+    batched = chain.run_many(STIMULI)
+    for (spkt, spkid), (spkt_b, spkid_b) in zip(single, batched):
+        assert len(spkt) > 0
+        assert np.array_equal(spkt, spkt_b) and np.array_equal(spkid, spkid_b)
+
+
+def test_chain_runs_cache_does_not_depend_on_n_chains(net):
+    model_params = {'chain': CHAIN, 'analysis': {'eps': 3, 'window': None}}
+    single = ChainRuns(model_params, ResultCache('single.sqlite', model_params)).run_packets(STIMULI)
+    sim.clearAll()
+    batched = ChainRuns(model_params, ResultCache('batched.sqlite', model_params), n_chains=3).run_packets(STIMULI)
+    sim.clearAll()
+    for (std, count), (std_b, count_b) in zip(single, batched):
+        assert np.array_equal(std, std_b) and np.array_equal(count, count_b)
+
+    runs = ChainRuns(model_params, ResultCache('batched.sqlite', model_params), n_chains=1)
+    cached = runs.run_packets(STIMULI)
+    assert runs.chain is None             # every run found in the cache
+    assert all(np.array_equal(a, b) for result, stored in zip(batched, cached) for a, b in zip(result, stored))
@@ -0,0 +1,49 @@
+import pytest
+from netpyne import specs, sim
+
+from synfire.model import soma_secs, EXC_SYN, add_chain
+from synfire.connectivity import connect_cells
+
+
+def chain_params(gid_shift=0):
+    netParams = specs.NetParams()
+    netParams.cellParams['E'] = {'secs': soma_secs()}
+    netParams.synMechParams['exc'] = dict(EXC_SYN)
+    add_chain(netParams, n_layers=3, layer_size=30, probability=0.2, weight=0.002, delay=5, pop='E{}')
+    if gid_shift:
+        add_chain(netParams, n_layers=3, layer_size=30, probability=0.2, weight=0.002, delay=5, pop='F{}',
+                  gid_shift=gid_shift)
+    simConfig = specs.SimConfig()
+    simConfig.verbose = False
+    return netParams, simConfig
+
+
+def conns(connect, gid_shift=0):
+    """Connections of the chain made by ``connect``, as sorted (pre, post, sec, loc, weight, delay) rows."""
+    netParams, simConfig = chain_params(gid_shift)
+    sim.initialize(netParams, simConfig)
+    sim.net.createPops()
+    sim.net.createCells()
+    connect()
+    rows = sorted((conn['preGid'], cell.gid, conn['sec'], conn['loc'], conn['weight'], conn['delay'])
+                  for cell in sim.net.cells for conn in cell.conns)
+    sim.clearAll()
+    return rows
+
+
+def test_connect_cells_matches_netpyne(net):
+    expected = conns(lambda: sim.net.connectCells())
+    assert len(expected) > 0
+    assert conns(connect_cells) == expected
+
+
+def test_connect_cells_without_netpyne_internals(net, monkeypatch):
+    expected = conns(lambda: sim.net.connectCells())
+    monkeypatch.delattr(sim, '_gatherAllCellTags')
+    assert conns(connect_cells) == expected
+
+
+def test_gid_shift_needs_netpyne_internals(net, monkeypatch):
+    monkeypatch.delattr(sim, '_gatherAllCellTags')
+    with pytest.raises(ValueError, match='gidShift'):
+        conns(connect_cells, gid_shift=90)
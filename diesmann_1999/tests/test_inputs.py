@@ -0,0 +1,39 @@
+from neuron import h
+import numpy as np
+import pytest
+
+from synfire.inputs import NoiseCurrent, BufferedNoise
+
+DT = 0.1
+
+
+def noise_current(noise_type, delay, seed=3):
+    """INoise current of a lone soma over 30 ms, one sample per step, with the noise starting at ``delay``."""
+    h.load_file('stdrun.hoc')
+    h.ParallelContext().nthread(1)
+    soma = h.Section(name='soma')
+    params = {'dt': DT} if noise_type is BufferedNoise else {}
+    noise = noise_type(soma(0.5), gid=0, std=0.3, dur=10, delay=delay, seed=seed, **params)
+    current = h.Vector().record(noise._inoise._ref_i, sec=soma)
+    h.dt = DT
+    h.finitialize(-65)
+    h.continuerun(30)
+    return current.as_numpy().copy()
+
+
+@pytest.mark.parametrize('noise_type', [NoiseCurrent, BufferedNoise])
+def test_delay_shifts_noise_onset(mechanisms, noise_type):
+    early, late = noise_current(noise_type, 5), noise_current(noise_type, 12)
+    for delay, current in ((5, early), (12, late)):
+        on = np.flatnonzero(current)
+        assert not current[:int(round(delay / DT))].any()
+        assert delay <= on[0] * DT < delay + 3 * DT and on[-1] * DT <= delay + 10 + DT
+    assert np.flatnonzero(late)[0] - np.flatnonzero(early)[0] == int(round(7 / DT))
+
+
+def test_buffered_noise_only_shifts_with_delay(mechanisms):
+    # the pre-drawn values are read from the onset on, so a later onset replays them later
+    early, late = noise_current(BufferedNoise, 5), noise_current(BufferedNoise, 12)
+    shift = int(round(7 / DT))
+    assert np.count_nonzero(early) > 90
+    assert np.array_equal(late[shift:], early[:len(early) - shift])
@@ -0,0 +1,37 @@
+import numpy as np
+
+from synfire.kernel import LayerExperiment, TransferKernel, layer_response
+
+
+def test_layer_response_counts_and_spreads_the_spikes():
+    a_out, s_out = layer_response([[10.0, 0.0, 12.0], [0.0, 0.0, 15.0]])
+    assert list(a_out) == [2, 1]
+    assert np.allclose(s_out, [1.0, 0.0])
+
+
+def test_kernel_propagates_and_samples_its_transitions():
+    a_values, s_values = [0, 50, 100], [0, 1]
+    counts = np.zeros((3, 2, 3, 2), dtype=int)
+    counts[:, :, 0, 0] = 1                # everything dies out ...
+    counts[2, :, 0, 0] = 1
+    counts[2, :, 2, 0] = 3                # ... except a full packet, which survives 3 times in 4
+    kernel = TransferKernel(a_values, s_values, counts)
+    assert np.allclose(kernel.matrix.sum(axis=1), 1)
+
+    dists = kernel.propagate(kernel.point(98, 0.8), 2)
+    assert dists.shape == (3, 3, 2)
+    assert dists[0, 2, 1] == 1
+    assert np.isclose(dists[1, 2, 0], 0.75) and np.isclose(dists[2, 2, 0], 0.75 ** 2)
+    assert np.isclose(kernel.survival(2)[2, 1], 0.75 ** 2) and kernel.survival(2)[1, 0] == 0
+
+    a, s = kernel.sample(100, 1, 2, n_samples=200, seed=5)
+    assert a.shape == s.shape == (200, 3)
+    assert np.all(a[:, 0] == 100) and set(a[:, 1]) == {0, 100}
+    assert np.array_equal(kernel.sample(100, 1, 2, n_samples=200, seed=5)[0], a)
+
+
+def test_layer_experiment_is_seeded(net):
+    experiment = LayerExperiment(layer_size=10, probability=0.5, weight=0.002, n_trials=2)
+    first = experiment.run_batch(40, 1, seed=3)
+    assert first.shape == (2, 10) and np.count_nonzero(first) > 0
+    assert np.array_equal(experiment.run_batch(40, 1, seed=3), first)
@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+from netpyne import sim
+
+from synfire.partition import cell_cost, distribute_cells, exchange_report, layer_partition, network_exchange, pop_layout, round_robin
+
+from test_connectivity import chain_params
+
+
+def test_pop_layout_of_a_chain():
+    netParams, _ = chain_params()
+    sizes, in_degrees = pop_layout(netParams)
+    assert sizes == [30, 30, 30] and np.allclose(in_degrees, [0, 6, 6])
+    assert np.allclose(cell_cost(sizes, in_degrees), np.repeat([1, 2.5, 2.5], 30))
+
+
+def test_layer_partition_keeps_layers_together():
+    sizes, in_degrees = [30, 30, 30], [0, 6, 6]
+    assert list(round_robin(sizes, in_degrees, 4)[:6]) == [0, 1, 2, 3, 0, 1]
+    ranks = layer_partition([30, 30, 30], [6, 6, 6], 3)
+    assert list(ranks) == [0] * 30 + [1] * 30 + [2] * 30
+    ranks = layer_partition([30, 31, 30, 29], [6, 6, 6, 6], 2)     # cut moved to the layer boundary
+    assert list(ranks) == [0] * 61 + [1] * 59
+    ranks = layer_partition(sizes, in_degrees, 2)
+    assert np.all(np.diff(ranks) >= 0) and len(ranks) == 90        # contiguous blocks
+    cost = np.bincount(ranks, weights=cell_cost(sizes, in_degrees))
+    assert cost.max() / cost.mean() < 1.05
+
+
+def test_exchange_report_counts_what_crosses_ranks():
+    ranks = [0, 0, 1, 1]
+    pre, post = [0, 0, 1, 2, 3], [1, 2, 3, 3, 0]
+    report = exchange_report(ranks, pre, post, spkid=[0, 0, 1, 3, 2], cost=[1, 2, 3, 4])
+    assert list(report['cells']) == [2, 2] and list(report['cost']) == [3, 7]
+    assert list(report['conns_out']) == [2, 1]      # 0->2, 1->3 and 3->0
+    assert list(report['sources']) == [2, 1]
+    assert list(report['spikes_out']) == [3, 1]
+
+
+def test_network_exchange_on_one_rank(net):
+    netParams, simConfig = chain_params()
+    sim.initialize(netParams, simConfig)
+    sim.net.createPops()
+    sim.net.createCells()
+    sim.net.connectCells()
+    report = network_exchange()
+    assert list(report['cells']) == [90] and list(report['conns_out']) == [0]
+
+
+def test_distribute_cells_restores_pops(net):
+    netParams, simConfig = chain_params()
+    sim.initialize(netParams, simConfig)
+    sim.net.createPops()
+    with distribute_cells(np.zeros(90, dtype=int)):
+        sim.net.createCells()
+    assert [cell.gid for cell in sim.net.cells] == list(range(90))
+    assert not any('_distributeCells' in vars(pop) for pop in sim.net.pops.values())
+
+    with pytest.raises(RuntimeError):
+        with distribute_cells(np.zeros(90, dtype=int)):
+            raise RuntimeError
+    assert not any('_distributeCells' in vars(pop) for pop in sim.net.pops.values())
@@ -0,0 +1,70 @@
+from netpyne import specs, sim
+import numpy as np
+
+from synfire.model import soma_secs, EXC_SYN, add_chain
+from synfire.inputs import NoiseCurrent
+from synfire.simrun import create_simulate_analyze
+from synfire.store import open_result
+
+
+def small_chain(filename, record_cells=('all',)):
+    """Three layers of 20 noisy cells, the first driven by an IClamp, recording V_soma every ms."""
+    netParams = specs.NetParams()
+    netParams.cellParams['E'] = {'secs': soma_secs()}
+    netParams.synMechParams['exc'] = dict(EXC_SYN)
+    add_chain(netParams, n_layers=3, layer_size=20, probability=0.3, weight=0.002, delay=5, pop='E{}')
+    netParams.stimSourceParams['IStim'] = {'type': 'IClamp', 'del': 1, 'dur': 10, 'amp': 0.4}
+    netParams.stimTargetParams['IStim->E0'] = {'source': 'IStim', 'sec': 'soma', 'loc': 0.5, 'conds': {'pop': 'E0'}}
+
+    simConfig = specs.SimConfig()
+    simConfig.duration = 50
+    simConfig.dt = 0.05
+    simConfig.verbose = False
+    simConfig.recordTraces = {'V_soma': {'sec': 'soma', 'loc': 0.5, 'var': 'v'}}
+    simConfig.recordCells = list(record_cells)
+    simConfig.recordStep = 1
+    simConfig.filename = filename
+    simConfig.savePickle = False
+    return netParams, simConfig
+
+
+def add_noise(cell):
+    return NoiseCurrent(cell.secs['soma']['hObj'](0.5), cell.gid, std=0.4, dur=50)
+
+
+def run_chain(n_threads, record_cells=('all',), **kwargs):
+    """Spikes and V_soma traces of one run of the small chain, read back from its store."""
+    filename = f'chain_{n_threads}_{"stream" if kwargs.get("stream_traces") is not None else "memory"}'
+    netParams, simConfig = small_chain(filename, record_cells)
+    create_simulate_analyze(netParams, simConfig, cell_hooks=[add_noise], n_threads=n_threads, **kwargs)
+    result = open_result(filename + '_result')
+    spkt, spkid = result.spikes()
+    t, v = result.trace('V_soma')
+    gids = result.gids('V_soma')
+    sim.clearAll()
+    return spkt, spkid, t, v, gids
+
+
+def test_threads_keep_spikes_and_traces(net):
+    spkt, spkid, t, v, gids = run_chain(1)
+    assert len(spkt) > 0
+    assert gids == list(range(60))
+    assert np.allclose(t, np.arange(51))
+    for n_threads in (2, 3):
+        spkt_n, spkid_n, t_n, v_n, gids_n = run_chain(n_threads)
+        assert np.array_equal(spkt_n, spkt) and np.array_equal(spkid_n, spkid)
+        assert gids_n == gids
+        assert np.array_equal(v_n, v), f'{n_threads} threads changed the traces'
+
+
+def test_streamed_traces_match_memory(net):
+    spkt, spkid, t, v, gids = run_chain(1, record_cells=(5, 25, 45))
+    assert gids == [5, 25, 45]
+    for n_threads in (1, 2):
+        # flushed every 7.3 ms, off the 1 ms recordStep grid
+        spkt_s, spkid_s, t_s, v_s, gids_s = run_chain(n_threads, record_cells=(5, 25, 45),
+                                                      stream_traces={'interval': 7.3})
+        assert np.array_equal(spkt_s, spkt) and np.array_equal(spkid_s, spkid)
+        assert gids_s == gids             # only the recorded cells, not every cell of the rank
+        assert np.allclose(t_s, t)
+        assert np.array_equal(v_s, v), f'{n_threads} threads changed the streamed traces'
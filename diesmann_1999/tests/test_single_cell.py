@@ -0,0 +1,38 @@
+import numpy as np
+from netpyne import sim
+
+from synfire.single_cell import SingleCellExperiment, first_spikes, packet_response
+
+
+def test_first_spikes_in_the_window():
+    spkt = [12.0, 5.0, 11.0, 25.0, 31.0, 14.0]
+    spkid = [1, 0, 1, 0, 2, 3]
+    assert list(first_spikes(spkt, spkid, 5, (10, 30))) == [25.0, 11.0, 0.0, 14.0, 0.0]
+
+
+def test_packet_response():
+    assert packet_response([0, 0]) == (0, 0)
+    alpha, s_out = packet_response([10.0, 0.0, 12.0, 0.0])
+    assert alpha == 0.5 and s_out == 1.0
+
+
+def test_seeded_batches_repeat(net):
+    experiment = SingleCellExperiment(n_trials=20)
+    first = experiment.run_batch(60, 2, seed=11)
+    assert np.count_nonzero(first) > 0
+    assert np.array_equal(experiment.run_batch(60, 2, seed=11), first)
+    assert not np.array_equal(experiment.run_batch(60, 2, seed=12), first)
+
+
+def test_early_stop_keeps_the_first_spikes(net):
+    results = []
+    for early_stop in (True, False):
+        experiment = SingleCellExperiment(n_trials=20, early_stop=early_stop)
+        results.append([experiment.run_batch(a_in, 2, seed=11) for a_in in (30, 60)])
+        sim.clearAll()
+    assert np.array_equal(results[0], results[1])
+
+
+def test_synapse_input_fires(net):
+    experiment = SingleCellExperiment(n_trials=10, input_type='synapse', input_params={'weight': 0.001})
+    assert np.count_nonzero(experiment.run_batch(80, 1, seed=3)) > 0
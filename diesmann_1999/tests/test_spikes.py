@@ -0,0 +1,35 @@
+import numpy as np
+
+from synfire.spikes import layer_spikes, largest_packet, PacketTracker
+
+
+def test_layer_spikes_split_by_gid_block_and_window():
+    spkt = [5.0, 1.0, 22.0, 3.0, 40.0, 21.0]
+    spkid = [0, 12, 11, 3, 25, 10]
+    layers = layer_spikes(spkt, spkid, [0, 10, 20])
+    assert [list(times) for times in layers] == [[5.0, 3.0], [1.0, 22.0, 21.0], [40.0]]
+    layers = layer_spikes(spkt, spkid, [0, 10, 20], windows=[(0, 4), (20, 30), (0, 30)])
+    assert [list(times) for times in layers] == [[3.0], [22.0, 21.0], []]
+
+
+def test_largest_packet_is_the_longest_run_of_close_spikes():
+    times = [30.0, 1.0, 10.0, 11.0, 12.5, 31.0, 32.0, 50.0]
+    packet, count, std = largest_packet(times, eps=2)
+    assert list(packet) == [10.0, 11.0, 12.5] and count == 3        # ties go to the earlier packet
+    assert std == np.std([10.0, 11.0, 12.5])
+    packet, count, std = largest_packet([1.0, 5.0, 9.0], eps=2)
+    assert len(packet) == 0 and count == 0 and std == 0
+
+
+def test_packet_tracker_stops_once_the_packet_dies_out():
+    layer_starts = [0, 10, 20, 30]
+    windows = [(0, 10), (10, 20), (20, 30), (30, 40)]
+    spkt = np.array([5.0, 5.5, 6.0, 15.0, 15.5, 25.0, 35.0, 35.1])
+    spkid = np.array([0, 1, 2, 10, 11, 20, 30, 31])
+    tracker = PacketTracker(layer_starts, windows, eps=1, extinct=1)
+    assert tracker.next_stop == 10
+    assert not tracker.update(spkt, spkid, 12)
+    assert [list(packet) for packet in tracker.packets] == [[5.0, 5.5, 6.0]]
+    assert tracker.update(spkt, spkid, 40)
+    assert [len(packet) for packet in tracker.packets] == [3, 2, 0]    # layer 3 is never analysed
+    assert tracker.next_stop == np.inf
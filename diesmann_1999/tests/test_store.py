@@ -0,0 +1,67 @@
+import json
+import os
+
+import numpy as np
+
+from synfire.store import save_result, open_result, convert_json
+
+
+def test_none_values_load_without_pickle(tmp_path):
+    path = tmp_path / 'result'
+    save_result(path, {'spkt': [2.0, 1.0], 'spkid': [0, 1], 't': [0.0, 1.0, 2.0], 'avgRate': None,
+                       'rates': [1.5, None], 'V_soma': {'cell_0': [0.0, 1.0, 2.0], 'cell_1': None}})
+    for filename in os.listdir(path):
+        if filename.endswith('.npy'):
+            np.load(path / filename, allow_pickle=False, mmap_mode='r')
+
+    result = open_result(path)
+    assert result.scalars['avgRate'] is None
+    assert np.array_equal(result.column('rates'), [1.5, np.nan], equal_nan=True)
+    assert np.array_equal(result.cell_values('V_soma', 0), [0.0, 1.0, 2.0])
+    assert np.isnan(result.cell_values('V_soma', 1)).all()
+
+
+def test_rewrite_removes_old_columns(tmp_path):
+    path = tmp_path / 'result'
+    save_result(path, {'spkt': [1.0], 'spkid': [0], 'old': [1, 2, 3]})
+    save_result(path, {'spkt': [2.0, 3.0], 'spkid': [1, 0]})
+    assert not os.path.exists(path / 'old.npy')
+    assert np.array_equal(open_result(path).spikes()[0], [2.0, 3.0])
+
+
+def test_round_trip(tmp_path):
+    t = np.arange(0, 10.5, 0.5)
+    sim_data = {'spkt': [3.0, 1.0, 2.0, 1.0], 'spkid': [2, 1, 0, 0], 't': t - 1e-10, 'avgRate': 5.5,
+                'V_soma': {f'cell_{gid}': np.sin(t + gid) for gid in (4, 0, 2)},
+                'stims': {'cell_0': {'IClamp': [1, 2]}, 'cell_2': {'IClamp': [3]}},
+                'pops': {'E0': {'rate': 2.5, 'gids': [0, 2, 4]}}}
+    save_result(tmp_path / 'result', sim_data, meta={'simConfig': {'dt': 0.05}})
+    result = open_result(tmp_path / 'result')
+
+    assert result.meta == {'simConfig': {'dt': 0.05}}
+    assert result.scalars == {'avgRate': 5.5, 'pops.E0.rate': 2.5}
+    assert np.array_equal(result.column('pops.E0.gids'), [0, 2, 4])
+    spkt, spkid = result.spikes()
+    assert list(spkt) == [1.0, 1.0, 2.0, 3.0] and list(spkid) == [0, 1, 0, 2]
+    spkt, spkid = result.spikes(t_start=1.5, t_stop=3, gids=[0, 2])
+    assert list(spkt) == [2.0] and list(spkid) == [0]
+
+    assert result.gids('V_soma') == [0, 2, 4]
+    t_read, v = result.trace('V_soma')
+    assert np.allclose(t_read, t) and np.array_equal(v[1], np.sin(t + 2))
+    t_read, v = result.trace('V_soma', gids=[4, 0], t_start=2, t_stop=4)
+    assert np.allclose(t_read, [2, 2.5, 3, 3.5])
+    assert np.array_equal(v, [np.sin(t[4:8] + 4), np.sin(t[4:8])])
+    assert np.array_equal(result.cell_values('stims.IClamp', 0), [1, 2])
+    assert np.array_equal(result.cell_values('stims.IClamp', 2), [3])
+
+
+def test_convert_json(tmp_path):
+    with open(tmp_path / 'fig.json', 'w') as f:
+        json.dump({'simConfig': {'duration': 10}, 'simData': {'spkt': [2.0, 1.0], 'spkid': [1, 0], 't': [0, 5, 10],
+                                                               'V_soma': {'cell_0': [0, 1, 2], 'cell_1': [3, 4, 5]}}}, f)
+    convert_json(tmp_path / 'fig.json', tmp_path / 'result')
+    result = open_result(tmp_path / 'result')
+    assert result.meta == {'simConfig': {'duration': 10}, 'source': 'fig.json'}
+    assert list(result.spikes()[1]) == [0, 1]
+    assert np.array_equal(result.trace('V_soma', gids=1)[1], [[3, 4, 5]])
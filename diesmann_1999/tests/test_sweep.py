@@ -0,0 +1,88 @@
+import numpy as np
+import pytest
+
+from synfire.adaptive import alpha_interval, converged, run_adaptive_sweep
+from synfire.cache import ResultCache
+from synfire.journal import SweepJournal
+from synfire.single_cell import model_params
+from synfire.sweep import SweepPool, run_sweep, run_tasks, sweep_tasks, task_seed
+
+A_IN, S_IN = [30, 60], [1.0, 3.0]
+SWEEP = {'n_trials': 40, 'trials_per_task': 20, 'root_seed': 5}
+
+
+@pytest.fixture
+def workers(mechanisms, tmp_path, monkeypatch):
+    """Runs the test in the mechanisms directory, whose ``x86_64`` spawned workers load on importing NEURON."""
+    monkeypatch.chdir(mechanisms)
+    return tmp_path
+
+
+def test_seeds_follow_the_grid_values():
+    assert task_seed(5, 30, 1.0, 0) == task_seed(5, 30, 1.0000001, 0)
+    assert len({task_seed(5, 30, 1.0, 0), task_seed(5, 30, 1.0, 1), task_seed(5, 60, 1.0, 0), task_seed(6, 30, 1.0, 0)}) == 4
+    tasks = sweep_tasks([30], [1.0, 3.0], 50, 20, 5)
+    assert [(j, chunk, n) for _, j, chunk, _, _, n, _ in tasks] == [(0, 0, 20), (0, 1, 20), (0, 2, 10),
+                                                                      (1, 0, 20), (1, 1, 20), (1, 2, 10)]
+    # a point gets the same batches in any grid
+    assert sweep_tasks([60, 30], [3.0], 50, 20, 5)[3][-1] == tasks[3][-1]
+
+
+def test_sweep_does_not_depend_on_the_pool_size(workers):
+    alpha, s_out = run_sweep(A_IN, S_IN, processes=1, **SWEEP)
+    assert alpha.shape == (2, 2) and alpha.max() > 0
+    assert all(np.array_equal(a, b) for a, b in zip(run_sweep(A_IN, S_IN, processes=2, **SWEEP), (alpha, s_out)))
+
+
+def test_sweep_reuses_cache_and_journal(workers):
+    cache = ResultCache(str(workers / 'cache.sqlite'), model_params())
+    journal = SweepJournal(str(workers / 'journal.jsonl'), model_params())
+    expected = run_sweep(A_IN, S_IN, processes=2, cache=cache, journal=journal, **SWEEP)
+    tasks = sweep_tasks(A_IN, S_IN, 40, 20, 5)
+
+    for store in ({'cache': cache}, {'journal': SweepJournal(str(workers / 'journal.jsonl'), model_params())}):
+        with SweepPool(2, trials_per_task=20) as pool:
+            results = run_tasks(tasks, pool, **store)
+            assert pool._pool is None                     # nothing simulated
+        assert len(results) == len(tasks)
+    assert all(np.array_equal(a, b) for a, b in zip(run_sweep(A_IN, S_IN, cache=cache, **SWEEP), expected))
+
+    # the adaptive sweep seeds its batches alike, so it finds them too
+    with SweepPool(2, trials_per_task=20) as pool:
+        alpha, s_out, n_trials = run_adaptive_sweep(A_IN, S_IN, batch_size=20, max_trials=40, alpha_width=0, s_out_width=0,
+                                                    root_seed=5, cache=cache, pool=pool)
+        assert pool._pool is None
+    assert np.array_equal(alpha, expected[0]) and np.array_equal(s_out, expected[1]) and np.all(n_trials == 40)
+
+
+def test_sweep_resumes_from_a_torn_journal(workers):
+    path = str(workers / 'journal.jsonl')
+    expected = run_sweep(A_IN, S_IN, processes=2, journal=SweepJournal(path, model_params()), **SWEEP)
+    with open(path, 'rb') as f:
+        lines = f.read().splitlines(keepends=True)
+    with open(path, 'wb') as f:
+        f.writelines(lines[:-1])
+        f.write(lines[-1][:len(lines[-1]) // 2])      # killed while appending the last batch
+
+    def missing(journal):
+        return [task for task in sweep_tasks(A_IN, S_IN, 40, 20, 5) if journal.get(*task[3:5], task[6], n=task[5]) is None]
+
+    journal = SweepJournal(path, model_params())
+    assert len(missing(journal)) == 1
+    resumed = run_sweep(A_IN, S_IN, processes=1, journal=journal, **SWEEP)
+    assert all(np.array_equal(a, b) for a, b in zip(resumed, expected))
+    assert missing(SweepJournal(path, model_params())) == []
+
+
+def test_adaptive_sweep_stops_where_the_cell_always_fires(workers):
+    alpha, s_out, n_trials = run_adaptive_sweep([5, 150], [1.0], batch_size=20, max_trials=100, alpha_width=0.2,
+                                                s_out_width=1, root_seed=5, processes=2)
+    assert alpha[1, 0] == 1 and n_trials[1, 0] < 100
+
+
+def test_confidence_intervals():
+    lo, hi = alpha_interval(50, 100)
+    assert lo < 0.5 < hi and hi - lo < 0.2
+    assert alpha_interval(0, 100)[0] == 0
+    assert converged(np.full(200, 20.0), alpha_width=0.05, s_out_width=1)
+    assert not converged(np.array([20.0, 0.0] * 10), alpha_width=0.05, s_out_width=1)